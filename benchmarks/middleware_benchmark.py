@@ -0,0 +1,137 @@
+import argparse
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+from urllib.request import urlopen
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from energy_consumption_reporter.middleware import EnergyAttributor, EnergyMiddleware
+
+
+class LinearModel:
+    """Stand-in power model so the benchmark runs without a trained EnergyModel."""
+
+    def __init__(self, idle: float = 10.0, peak: float = 65.0):
+        self.idle = idle
+        self.peak = peak
+
+    def predict(self, utilization: float):
+        return self.idle + (self.peak - self.idle) * utilization / 100
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def app(environ, start_response):
+    path = environ.get("PATH_INFO", "/")
+    if path == "/cpu":
+        # roughly a millisecond of pure Python work
+        total = sum(i * i for i in range(20_000))
+        body = str(total).encode()
+    elif path == "/io":
+        time.sleep(0.005)
+        body = b"slept"
+    else:
+        body = b"ok"
+    start_response("200 OK", [("Content-Type", "text/plain"),
+                              ("Content-Length", str(len(body)))])
+    return [body]
+
+
+def run_load(port: int, paths: list[str], requests: int, concurrency: int) -> dict:
+    def fetch(i):
+        start = time.perf_counter()
+        with urlopen(f"http://127.0.0.1:{port}{paths[i % len(paths)]}") as response:
+            response.read()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        latencies = list(pool.map(fetch, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "throughput": requests / elapsed,
+        "p50_latency_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_latency_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+def serve(wsgi_app):
+    server = make_server("127.0.0.1", 0, wsgi_app,
+                         server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+def bench_begin_end(attributor: EnergyAttributor, n: int = 100_000) -> float:
+    """Returns the mean cost of one begin()/end() pair in microseconds."""
+    start = time.perf_counter()
+    for _ in range(n):
+        attributor.end(attributor.begin("GET /bench"))
+    return (time.perf_counter() - start) / n * 1_000_000
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="MiddlewareBenchmark",
+        description="Measures the overhead of the energy middleware on a local WSGI server.",
+    )
+    parser.add_argument("--requests", type=int, default=2000,
+                        help="number of requests per run")
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="number of concurrent clients")
+    parser.add_argument("--interval", type=float, default=0.2,
+                        help="sampling window in seconds")
+    parser.add_argument("--energy-model", action="store_true",
+                        help="use the trained EnergyModel instead of a linear stand-in")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _parser().parse_args()
+    paths = ["/cpu", "/io", "/"]
+
+    model = None if args.energy_model else LinearModel()
+    attributor = EnergyAttributor(model=model, interval=args.interval)
+
+    server = serve(app)
+    baseline = run_load(server.server_port, paths,
+                        args.requests, args.concurrency)
+    server.shutdown()
+
+    server = serve(EnergyMiddleware(app, attributor))
+    measured = run_load(server.server_port, paths,
+                        args.requests, args.concurrency)
+    server.shutdown()
+    # let the sampler close the window of the last requests
+    time.sleep(args.interval * 2)
+    attributor.stop()
+
+    routes = attributor.summary()
+    result = {
+        "baseline": baseline,
+        "middleware": measured,
+        "throughput_overhead_pct": (1 - measured["throughput"] / baseline["throughput"]) * 100,
+        "begin_end_overhead_us": bench_begin_end(
+            EnergyAttributor(model=LinearModel())),
+        "unattributed_energy": attributor.unattributed_energy,
+        "routes": routes,
+        "attributed_requests": sum(r["N"] for r in routes.values()),
+    }
+    print(json.dumps(result, indent=4))
+    # every request must be counted exactly once
+    if result["attributed_requests"] != args.requests:
+        sys.exit(f"Attributed {result['attributed_requests']} requests, sent {args.requests}")
@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from multiprocessing import Pipe
+from multiprocessing.managers import BaseManager
+from typing import Any, Callable, Optional
+
+import psutil
+
+from energy_consumption_reporter.measure_process import MeasureProcess
+from energy_consumption_reporter.report_builder import ReportBuilder
+
+ROOT = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+
+class LinearModel:
+    """Stand-in power model, so only the cost of the reporter itself is measured."""
+
+    def __init__(self):
+        self.zero_offset = False
+
+    def set_zero_offset(self, zero_offset: bool):
+        self.zero_offset = zero_offset
+
+    def predict(self, utilization: float):
+        return 10.0 + 0.55 * utilization
+
+
+def busy(seconds: float):
+    """Synthetic CPU-bound workload."""
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(i * i for i in range(1000))
+
+
+def median_time(func: Callable[[], Any], repeat: int) -> float:
+    """Returns the median wall time of func in ms."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def _run_python(code: str) -> float:
+    output = subprocess.check_output(
+        [sys.executable, "-c", code], cwd=ROOT, stderr=subprocess.DEVNULL, encoding="UTF-8")
+    return float(output.strip().splitlines()[-1])
+
+
+def bench_import(module: str, repeat: int) -> float:
+    """Median time in ms to import module in a fresh interpreter."""
+    code = ("import time; start = time.perf_counter(); "
+            f"import {module}; print((time.perf_counter() - start) * 1000)")
+    return statistics.median(_run_python(code) for _ in range(repeat))
+
+
+def bench_tester_construction(repeat: int) -> float:
+    """Median time in ms of EnergyTester.__init__, bypassing the singleton."""
+    code = ("import time; from energy_consumption_reporter.energy_tester import EnergyTester; "
+            "tester = object.__new__(EnergyTester); start = time.perf_counter(); "
+            "tester.__init__(); print((time.perf_counter() - start) * 1000)")
+    return statistics.median(_run_python(code) for _ in range(repeat))
+
+
+def bench_sampler(duration: float, repeat: int) -> dict[str, float]:
+    """Start/stop latency of MeasureProcess and its CPU time per sample."""
+    conn1, conn2 = Pipe()
+    model = LinearModel()
+    start_times = []
+    stop_times = []
+    cpu_per_sample = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        process = MeasureProcess(conn1, model)
+        process.start()
+        start_times.append((time.perf_counter() - start) * 1000)
+
+        busy(duration)
+
+        start = time.perf_counter()
+        process.terminate()
+        process.join()
+        values = conn2.recv()
+        stop_times.append((time.perf_counter() - start) * 1000)
+
+        if isinstance(values, Exception):
+            raise values
+        # the sampler reports its own CPU time (process_time, ns resolution)
+        # over its whole run, psutil's cpu_times() only has clock tick resolution
+        samples = len(values[5]["utilization"])
+        cpu_per_sample.append(values[7] * 1000 / max(samples, 1))
+
+    return {
+        "sampler_start": statistics.median(start_times),
+        "sampler_stop": statistics.median(stop_times),
+        "sampler_cpu_per_sample": statistics.median(cpu_per_sample),
+    }
+
+
+def bench_rpc(calls: int) -> dict[str, float]:
+    """Latency of model.predict through a BaseManager proxy versus a direct call."""
+    BaseManager.register("benchmark_model", LinearModel)
+    manager = BaseManager()
+    manager.start()
+    try:
+        proxy = manager.benchmark_model()  # type: ignore
+        direct = LinearModel()
+        proxy.predict(50.0)
+        return {
+            "rpc_predict": median_time(lambda: [proxy.predict(50.0) for _ in range(calls)], 3) / calls,
+            "direct_predict": median_time(lambda: [direct.predict(50.0) for _ in range(calls)], 3) / calls,
+        }
+    finally:
+        manager.shutdown()
+
+
+def bench_report(case_counts: list[int], repeat: int) -> dict[str, float]:
+    """Time of add_case and save_report for reports with an increasing amount of cases."""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for count in case_counts:
+            builder = ReportBuilder(name="Benchmark", model_name="LinearModel")
+            builder.generate_report()
+
+            def add_cases():
+                builder.report["results"]["cases"] = []
+                for i in range(count):
+                    builder.add_case(time_list=[1000] * 5, energy_list=[12.3456789] * 5,
+                                     power_list=[12.3456789] * 5, avg_cpu_util=12.3456789,
+                                     test_name=f"test_{i}", passed=True, reason="")
+
+            results[f"add_case_{count}"] = median_time(add_cases, repeat)
+            results[f"save_report_{count}"] = median_time(
+                lambda: builder.save_report(os.path.join(tmp_dir, "report.json")), repeat)
+    return results
+
+
+def bench_energy_model(calls: int) -> dict[str, float]:
+    """Prediction latency of the trained EnergyModel (skipped if it cannot be loaded)."""
+    from energy_consumption_reporter.energy_model import EnergyModel
+
+    model = EnergyModel()
+    model.predict(50.0)
+    return {
+        "energy_model_predict": median_time(lambda: [model.predict(50.0) for _ in range(calls)], 3) / calls,
+        "energy_model_predict_batch": median_time(lambda: model.predict_batch([50.0] * calls), 3),
+    }
+
+
+def run(quick: bool = False) -> dict[str, Any]:
+    repeat = 3 if quick else 10
+    results: dict[str, Optional[float]] = {}
+    errors: dict[str, str] = {}
+
+    def collect(name: str, func: Callable[[], Any]):
+        try:
+            value = func()
+        except Exception as err:
+            errors[name] = f"{type(err).__name__}: {err}"
+            return
+        if isinstance(value, dict):
+            results.update(value)
+        else:
+            results[name] = value
+
+    for module in ("report_builder", "measure_process", "sampler", "energy_model", "energy_tester"):
+        collect(f"import_{module}", lambda: bench_import(
+            f"energy_consumption_reporter.{module}", repeat))
+    collect("tester_construction", lambda: bench_tester_construction(
+        min(repeat, 3)))
+    collect("sampler", lambda: bench_sampler(
+        0.5 if quick else 2.0, min(repeat, 5)))
+    collect("rpc", lambda: bench_rpc(200 if quick else 1000))
+    collect("report", lambda: bench_report(
+        [10, 100] if quick else [10, 100, 1000], repeat))
+    collect("energy_model", lambda: bench_energy_model(
+        100 if quick else 1000))
+
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": psutil.cpu_count(),
+        "unit": "ms",
+        "results": results,
+        "errors": errors,
+    }
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[dict[str, Any]]:
+    """Returns a row per metric present in both runs, flagging regressions."""
+    rows = []
+    for name, value in sorted(current["results"].items()):
+        base = baseline["results"].get(name)
+        if base is None or value is None or base <= 0:
+            continue
+        ratio = value / base
+        rows.append({"name": name, "baseline": base, "current": value,
+                    "ratio": ratio, "regression": ratio > 1 + threshold})
+    return rows
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="OverheadBenchmark",
+        description="Measures the overhead of the energy consumption reporter itself.",
+    )
+    parser.add_argument("-o", "--output",
+                        help="file to write the results to (JSON)")
+    parser.add_argument("-b", "--baseline",
+                        help="results of an earlier run to compare against")
+    parser.add_argument("-t", "--threshold", type=float, default=0.2,
+                        help="relative slowdown that counts as a regression")
+    parser.add_argument("--quick", action="store_true",
+                        help="fewer repetitions, for a fast check")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _parser().parse_args()
+    current = run(args.quick)
+
+    if args.output:
+        with open(args.output, 'w+') as file:
+            file.write(json.dumps(current, indent=4))
+
+    if not args.baseline:
+        print(json.dumps(current, indent=4))
+        sys.exit(0)
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)
+
+    rows = compare(current, baseline, args.threshold)
+    for row in rows:
+        print(f"{row['name']:<32} {row['baseline']:>12.4f} {row['current']:>12.4f} "
+              f"{row['ratio']:>7.2f}x{'  REGRESSION' if row['regression'] else ''}")
+    sys.exit(1 if any(row["regression"] for row in rows) else 0)
@@ -0,0 +1,255 @@
+import contextlib
+import functools
+import importlib.util
+import logging
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+
+from energy_consumption_reporter.energy_tester import EnergyTester, OutputType
+
+logger = logging.getLogger(__name__)
+
+
+def _is_under(module, root: str) -> bool:
+    file_path = getattr(module, "__file__", None)
+    return file_path is not None and os.path.realpath(file_path).startswith(root + os.sep)
+
+
+def _provided_modules(root: str) -> set[str]:
+    """Returns the top-level module names importable from root."""
+    names = set()
+    for entry in os.listdir(root):
+        name, extension = os.path.splitext(entry)
+        if extension == ".py" or (extension == "" and os.path.isdir(os.path.join(root, entry))):
+            if name.isidentifier():
+                names.add(name)
+    return names
+
+
+@contextlib.contextmanager
+def _worktree_imports(root: str, modules: dict[str, Any]):
+    """Makes root importable with its already imported modules in sys.modules.
+
+    Imported modules with the name of a module in root, e.g. the package
+    under test imported from the current checkout, are set aside meanwhile,
+    so they do not shadow the ones of root. Afterwards the modules of root,
+    including ones imported in between, are moved from sys.modules back into
+    modules, so they do not shadow the modules of another worktree either.
+    """
+    provided = _provided_modules(root)
+    hidden = {name: sys.modules.pop(name) for name in list(sys.modules)
+              if name.partition(".")[0] in provided}
+    sys.modules.update(modules)
+    sys.path.insert(0, root)
+    try:
+        yield
+    finally:
+        sys.path.remove(root)
+        for name, module in list(sys.modules.items()):
+            if _is_under(module, root):
+                modules[name] = sys.modules.pop(name)
+        sys.modules.update(hidden)
+
+
+def load_entry_point(worktree: str, entry_point: str) -> Callable:
+    """Loads a function from a file in a (git worktree) directory.
+
+    Only while the function is loaded or runs, the worktree is on sys.path
+    and its modules are in sys.modules. This way the same entry point can
+    be loaded from another worktree without reusing the modules of the
+    first one, and imports inside the function resolve against its own
+    worktree. Modules from outside the worktree stay imported.
+
+    Keyword arguments:
+    worktree -- root directory the entry point is relative to
+    entry_point -- file and function, e.g. "benchmarks/parse.py:run"
+    """
+    root = os.path.realpath(worktree)
+    file_path, _, func_name = entry_point.partition(":")
+    path = os.path.realpath(os.path.join(root, file_path))
+    module_name = "_ab_entry_point_" + str(abs(hash(path)))
+
+    modules: dict[str, Any] = {}
+    with _worktree_imports(root, modules):
+        spec = importlib.util.spec_from_file_location(module_name, path)
+        if spec is None or spec.loader is None:
+            raise ImportError(f"Could not load entry point {entry_point} from {worktree}")
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    func = getattr(module, func_name)
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        with _worktree_imports(root, modules):
+            return func(*args, **kwargs)
+
+    return run
+
+
+def add_worktree(ref: str, path: str, repo: str = "."):
+    subprocess.check_output(
+        ["git", "-C", repo, "worktree", "add", "--detach", path, ref], stderr=subprocess.STDOUT)
+
+
+def remove_worktree(path: str, repo: str = "."):
+    subprocess.check_output(
+        ["git", "-C", repo, "worktree", "remove", "--force", path], stderr=subprocess.STDOUT)
+
+
+def bootstrap_ci(values, confidence: float = 0.95, resamples: int = 10_000, seed: Optional[int] = None) -> tuple[Optional[float], Optional[float]]:
+    """Returns the percentile bootstrap confidence interval of the mean of values."""
+    values = np.asarray(values, dtype=float)
+    if len(values) < 2:
+        return None, None
+    rng = np.random.default_rng(seed)
+    means = rng.choice(values, size=(resamples, len(values))).mean(axis=1)
+    alpha = (1 - confidence) / 2
+    low, high = np.quantile(means, [alpha, 1 - alpha])
+    return float(low), float(high)
+
+
+def paired_statistics(a, b, confidence: float = 0.95, seed: Optional[int] = None) -> dict[str, Any]:
+    """Compares paired measurements a and b (b - a) with confidence intervals."""
+    a = np.asarray(a, dtype=float)
+    b = np.asarray(b, dtype=float)
+    differences = b - a
+    relative = differences / a * 100
+    ci_low, ci_high = bootstrap_ci(differences, confidence, seed=seed)
+    rel_low, rel_high = bootstrap_ci(relative, confidence, seed=seed)
+    return {
+        "mean_a": float(np.mean(a)),
+        "mean_b": float(np.mean(b)),
+        "mean_difference": float(np.mean(differences)),
+        "ci_difference": [ci_low, ci_high],
+        "mean_relative_difference": float(np.mean(relative)),
+        "ci_relative_difference": [rel_low, rel_high],
+    }
+
+
+class ABRunner:
+    """Compares two functions by running them interleaved in randomized blocks.
+
+    Every block runs both functions once (each for block_size iterations) in
+    a random order, so thermal state, turbo behaviour and background load
+    affect both alike. The per-block results are compared pairwise.
+
+    Keyword arguments:
+    tester -- EnergyTester to measure with (default: EnergyTester())
+    """
+
+    def __init__(self, tester: Optional[EnergyTester] = None):
+        self.tester = tester or EnergyTester()
+
+    def compare(self, func_a: Callable, func_b: Callable, blocks: int = 10, block_size: int = 1, cooldown: float = 0.0, seed: Optional[int] = None, confidence: float = 0.95, name: Optional[str] = None, name_a: Optional[str] = None, name_b: Optional[str] = None, include_case: bool = True) -> dict[str, Any]:
+        """Runs the comparison and returns the paired statistics.
+
+        Keyword arguments:
+        func_a -- baseline function
+        func_b -- function to compare against the baseline
+        blocks -- amount of randomized blocks (pairs)
+        block_size -- iterations of each function within a block
+        cooldown -- seconds to sleep before every run
+        seed -- seed for the block order and the bootstrap
+        confidence -- confidence level of the intervals
+        """
+        name_a = name_a or func_a.__qualname__
+        name_b = name_b or func_b.__qualname__
+        name = name or f"{name_a} vs {name_b}"
+        rng = random.Random(seed)
+
+        results: dict[str, dict[str, list]] = {
+            label: {"time": [], "energy": [], "power": [], "cpu_util": []} for label in ("A", "B")}
+        order_list = []
+        passed = True
+        reason = ""
+        for block in range(blocks):
+            order = [("A", func_a, name_a), ("B", func_b, name_b)]
+            rng.shuffle(order)
+            order_list.append("".join(label for label, _, _ in order))
+
+            for label, func, func_name in order:
+                if cooldown > 0:
+                    time.sleep(cooldown)
+                logging.debug(f"Comparison {name}, Block: {block + 1}, Run: {label}")
+
+                values = self.tester.test(
+                    func, block_size, func_name=func_name, include_case=False)
+                if values["exception"] is not None:
+                    passed = False
+                    reason = f"{label}: {values['exception']}"
+                    break
+
+                results[label]["time"].append(float(np.mean(values["time"])))
+                results[label]["energy"].append(float(np.mean(values["energy"])))
+                results[label]["power"].append(float(np.mean(values["power"])))
+                results[label]["cpu_util"].append(values["cpu_util"])
+            if not passed:
+                break
+
+        # only complete blocks can be paired
+        pairs = min(len(results["A"]["energy"]), len(results["B"]["energy"]))
+        comparison = {
+            "name": name,
+            "a": name_a,
+            "b": name_b,
+            "blocks": pairs,
+            "block_size": block_size,
+            "cooldown": cooldown,
+            "order": order_list[:pairs],
+            "confidence": confidence,
+        }
+        if pairs > 0:
+            comparison["energy"] = paired_statistics(
+                results["A"]["energy"][:pairs], results["B"]["energy"][:pairs], confidence, seed)
+            comparison["execution_time"] = paired_statistics(
+                results["A"]["time"][:pairs], results["B"]["time"][:pairs], confidence, seed)
+
+        if include_case:
+            for label, func_name in (("A", name_a), ("B", name_b)):
+                self.tester.report_builder.add_case(time_list=results[label]["time"][:pairs],
+                                                    energy_list=results[label]["energy"][:pairs],
+                                                    power_list=results[label]["power"][:pairs],
+                                                    avg_cpu_util=float(np.mean(results[label]["cpu_util"])) if pairs else 0.0,
+                                                    test_name=func_name,
+                                                    passed=passed,
+                                                    reason=reason,
+                                                    extra={"comparison": name})
+            self.tester.report_builder.add_comparison(comparison)
+
+        if self.tester.save_report == OutputType.JSON or self.tester.save_report == OutputType.PRINT_JSON:
+            self.tester.report_builder.save_report()
+
+        return comparison
+
+    def compare_refs(self, ref_a: str, ref_b: str, entry_point: str, repo: str = ".", **kwargs) -> dict[str, Any]:
+        """Compares the same entry point at two git refs using temporary worktrees.
+
+        Keyword arguments:
+        ref_a -- baseline git ref (commit, branch or tag)
+        ref_b -- git ref to compare against the baseline
+        entry_point -- file and function relative to the repository root, e.g. "bench.py:run"
+        repo -- path of the git repository
+        """
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path_a = os.path.join(tmp_dir, "a")
+            path_b = os.path.join(tmp_dir, "b")
+            add_worktree(ref_a, path_a, repo)
+            try:
+                add_worktree(ref_b, path_b, repo)
+                try:
+                    func_a = load_entry_point(path_a, entry_point)
+                    func_b = load_entry_point(path_b, entry_point)
+                    kwargs.setdefault("name_a", f"{entry_point}@{ref_a}")
+                    kwargs.setdefault("name_b", f"{entry_point}@{ref_b}")
+                    return self.compare(func_a, func_b, **kwargs)
+                finally:
+                    remove_worktree(path_b, repo)
+            finally:
+                remove_worktree(path_a, repo)
@@ -0,0 +1,471 @@
+import argparse
+import json
+import logging
+import math
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+STATISTICS = ("energy", "net_energy", "power", "execution_time")
+
+
+def parse_address(address: str) -> tuple[int, Union[str, tuple[str, int]]]:
+    """Returns the socket family and address of "host:port" or a Unix socket path."""
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit() and "/" not in address:
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+
+class RunningStats:
+    """Mean, variance, minimum and maximum updated one value at a time (Welford)."""
+
+    def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self.m2 += delta * (value - self.mean)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "n": self.n,
+            "mean": self.mean,
+            "std": math.sqrt(self.m2 / (self.n - 1)) if self.n > 1 else 0.0,
+            "min": self.min if self.n else None,
+            "max": self.max if self.n else None,
+        }
+
+
+class TestStats:
+    """Rolling statistics of one test on one CPU model, scored by one power model."""
+
+    def __init__(self):
+        self.cases = 0
+        self.failed = 0
+        self.hosts: set[str] = set()
+        self.stats = {name: RunningStats() for name in STATISTICS}
+
+    def add(self, case: dict[str, Any], host: str):
+        self.cases += 1
+        if case.get("result") == "fail":
+            self.failed += 1
+        self.hosts.add(host)
+        for name, stats in self.stats.items():
+            for value in case.get(name) or []:
+                stats.add(float(value))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "cases": self.cases,
+            "failed": self.failed,
+            "hosts": len(self.hosts),
+            **{name: stats.to_dict() for name, stats in self.stats.items() if stats.n},
+        }
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _valid_record(record) -> bool:
+    """Returns whether record can be added without raising halfway."""
+    if not isinstance(record, dict) or not isinstance(record.get("run_id"), (str, int)):
+        return False
+    if not isinstance(record.get("seq"), int) or isinstance(record["seq"], bool):
+        return False
+    if not isinstance(record.get("hardware") or {}, dict) or not isinstance(record.get("model", ""), str):
+        return False
+    case = record.get("case")
+    if not isinstance(case, dict) or not isinstance(case.get("name"), str):
+        return False
+    for name in STATISTICS:
+        values = case.get(name) or []
+        if not isinstance(values, list) or not all(_is_number(value) for value in values):
+            return False
+    return True
+
+
+class Aggregator:
+    """Fleet-wide statistics of the cases sent by many report builders.
+
+    A record is {"run_id", "seq", "model", "hardware", "case"}, where seq
+    numbers the cases of a run. Records that were already seen are ignored,
+    so clients can safely resend a batch after a connection error. Only the
+    sequence numbers of the last max_runs runs are remembered.
+
+    Keyword arguments:
+    max_runs -- amount of runs remembered for the deduplication
+    """
+
+    def __init__(self, max_runs: int = 10000):
+        self.max_runs = max_runs
+        self.lock = threading.Lock()
+        self.seen: OrderedDict[str, set[int]] = OrderedDict()
+        self.tests: dict[tuple[str, str, str], TestStats] = {}
+        self.accepted = 0
+        self.duplicates = 0
+
+    def add(self, records: list[dict[str, Any]]) -> tuple[int, int]:
+        """Adds a batch of records and returns the amount accepted and the amount of duplicates."""
+        # validate the whole batch first, so a bad record does not leave it half applied
+        if not isinstance(records, list):
+            raise ValueError("records must be a list")
+        for record in records:
+            if not _valid_record(record):
+                raise ValueError(f"Invalid record: {record!r:.200}")
+
+        accepted = 0
+        with self.lock:
+            for record in records:
+                run_id = str(record["run_id"])
+                seen = self.seen.get(run_id)
+                if seen is None:
+                    seen = self.seen[run_id] = set()
+                    if len(self.seen) > self.max_runs:
+                        self.seen.popitem(last=False)
+                if record["seq"] in seen:
+                    continue
+                seen.add(record["seq"])
+
+                hardware = record.get("hardware") or {}
+                case = record["case"]
+                key = (str(hardware.get("CPU_name", "Unknown CPU")),
+                       record.get("model", "Unknown"), case["name"])
+                stats = self.tests.get(key)
+                if stats is None:
+                    stats = self.tests[key] = TestStats()
+                stats.add(case, str(hardware.get("PC_name", "Unknown")))
+                accepted += 1
+
+            self.accepted += accepted
+            self.duplicates += len(records) - accepted
+        return accepted, len(records) - accepted
+
+    def query(self, cpu: Optional[str] = None, model: Optional[str] = None, test: Optional[str] = None) -> list[dict[str, Any]]:
+        """Returns the statistics per test, CPU model and power model, optionally filtered."""
+        with self.lock:
+            return [{"cpu": key[0], "model": key[1], "test": key[2], **stats.to_dict()}
+                    for key, stats in sorted(self.tests.items())
+                    if (cpu is None or key[0] == cpu) and (model is None or key[1] == model)
+                    and (test is None or key[2] == test)]
+
+    def status(self) -> dict[str, Any]:
+        with self.lock:
+            return {"runs": len(self.seen), "tests": len(self.tests),
+                    "accepted": self.accepted, "duplicates": self.duplicates}
+
+
+def handle_message(aggregator: Aggregator, message: dict[str, Any]) -> dict[str, Any]:
+    """Handles a request of a client and returns the reply."""
+    if not isinstance(message, dict):
+        return {"ok": False, "error": "A message must be a JSON object"}
+    try:
+        kind = message.get("type")
+        if kind == "records":
+            accepted, duplicates = aggregator.add(message["records"])
+            return {"ok": True, "accepted": accepted, "duplicates": duplicates}
+        if kind == "query":
+            return {"ok": True, "results": aggregator.query(message.get("cpu"), message.get("model"), message.get("test"))}
+        if kind == "status":
+            return {"ok": True, **aggregator.status()}
+        return {"ok": False, "error": f"Unknown message type: {kind}"}
+    except (AttributeError, KeyError, TypeError, ValueError) as err:
+        return {"ok": False, "error": f"{type(err).__name__}: {err}"}
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        # one JSON message per line, answered with one JSON reply per line
+        for line in self.rfile:
+            try:
+                message = json.loads(line)
+            except ValueError as err:
+                reply = {"ok": False, "error": f"Invalid message: {err}"}
+            else:
+                reply = handle_message(self.server.aggregator, message)  # type: ignore
+            self.wfile.write(json.dumps(reply).encode("utf-8") + b"\n")
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class _UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+class AggregatorServer:
+    """Serves an Aggregator over TCP ("host:port") or a Unix socket (path).
+
+    Keyword arguments:
+    address -- "host:port" (port 0 picks a free port) or the path of a Unix socket
+    aggregator -- aggregator to serve (default: a new one)
+    """
+
+    def __init__(self, address: str, aggregator: Optional[Aggregator] = None):
+        self.aggregator = aggregator or Aggregator()
+        family, bind_address = parse_address(address)
+        if family == socket.AF_UNIX:
+            if os.path.exists(bind_address):  # type: ignore
+                os.unlink(bind_address)  # type: ignore
+            self.server = _UnixServer(bind_address, _Handler)
+        else:
+            self.server = _TCPServer(bind_address, _Handler)
+        self.server.aggregator = self.aggregator  # type: ignore
+        self.thread = None
+
+    @property
+    def address(self) -> str:
+        """The address clients connect to."""
+        if isinstance(self.server.server_address, tuple):
+            host, port = self.server.server_address[:2]
+            return f"{host}:{port}"
+        return str(self.server.server_address)
+
+    def serve_forever(self):
+        logger.info('Aggregator listening on %s', self.address)
+        self.server.serve_forever()
+
+    def start(self) -> "AggregatorServer":
+        """Serves in a background thread."""
+        self.thread = threading.Thread(
+            target=self.serve_forever, name="energy-aggregator", daemon=True)
+        self.thread.start()
+        return self
+
+    def shutdown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        if isinstance(self.server.server_address, str) and os.path.exists(self.server.server_address):
+            os.unlink(self.server.server_address)
+
+
+class SocketTransport:
+    """Sends messages to an AggregatorServer, (re)connecting when needed.
+
+    Keyword arguments:
+    address -- "host:port" or the path of a Unix socket
+    timeout -- socket timeout in seconds
+    """
+
+    def __init__(self, address: str, timeout: float = 5.0):
+        self.family, self.address = parse_address(address)
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.sock = None
+        self.file = None
+
+    def request(self, message: dict[str, Any]) -> dict[str, Any]:
+        with self.lock:
+            try:
+                if self.sock is None:
+                    self.sock = socket.socket(self.family, socket.SOCK_STREAM)
+                    self.sock.settimeout(self.timeout)
+                    self.sock.connect(self.address)
+                    self.file = self.sock.makefile("rb")
+                self.sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+                line = self.file.readline()  # type: ignore
+                if not line:
+                    raise ConnectionError("Connection closed by the aggregator")
+                return json.loads(line)
+            except OSError:
+                self._close()
+                raise
+
+    def _close(self):
+        if self.file is not None:
+            self.file.close()
+        if self.sock is not None:
+            self.sock.close()
+        self.sock = None
+        self.file = None
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+
+class LocalTransport:
+    """Stand-in for SocketTransport that hands messages to an in-process Aggregator.
+
+    Messages still go through JSON, so they are checked like on the wire.
+    """
+
+    def __init__(self, aggregator: Optional[Aggregator] = None):
+        self.aggregator = aggregator or Aggregator()
+
+    def request(self, message: dict[str, Any]) -> dict[str, Any]:
+        return json.loads(json.dumps(handle_message(self.aggregator, json.loads(json.dumps(message)))))
+
+    def close(self):
+        pass
+
+
+class AggregatorClient(threading.Thread):
+    """Buffers records and sends them to the aggregator in batches from a background thread.
+
+    send() never blocks: when the buffer is full the record is dropped and
+    counted. A batch that could not be sent is retried, since the aggregator
+    ignores records it has already seen.
+
+    Keyword arguments:
+    transport -- SocketTransport or LocalTransport to send the batches with
+    batch_size -- maximum amount of records per batch
+    flush_interval -- maximum time a record waits for its batch to fill in seconds
+    max_queue -- maximum amount of buffered records
+    retries -- amount of attempts per batch before it is dropped
+    retry_interval -- time between two attempts in seconds
+    """
+
+    def __init__(self, transport, batch_size: int = 100, flush_interval: float = 1.0, max_queue: int = 10000, retries: int = 3, retry_interval: float = 1.0):
+        super().__init__(name="energy-aggregator-client", daemon=True)
+        self.transport = transport
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.retry_interval = retry_interval
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.exit = threading.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def send(self, record: dict[str, Any]) -> bool:
+        """Buffers a record and returns whether it fitted in the buffer."""
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        return True
+
+    def _next_batch(self) -> list[dict[str, Any]]:
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            # do not wait for the batch to fill up when closing
+            remaining = 0 if self.exit.is_set() else deadline - time.monotonic()
+            try:
+                batch.append(self.queue.get(timeout=remaining)
+                             if remaining > 0 else self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _send_batch(self, batch: list[dict[str, Any]]):
+        for attempt in range(self.retries):
+            try:
+                reply = self.transport.request(
+                    {"type": "records", "records": batch})
+            except OSError as err:
+                logger.warning('Sending %d records to the aggregator failed (attempt %d): %s',
+                               len(batch), attempt + 1, err)
+                if self.exit.wait(self.retry_interval):
+                    break
+                continue
+            if not reply.get("ok"):
+                logger.warning('The aggregator rejected %d records: %s',
+                               len(batch), reply.get("error"))
+                break
+            self.sent += len(batch)
+            return
+        self.dropped += len(batch)
+
+    def run(self):
+        while not (self.exit.is_set() and self.queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._send_batch(batch)
+                for _ in batch:
+                    self.queue.task_done()
+
+    def flush(self, timeout: float = 5.0) -> bool:
+        """Waits until all buffered records are sent and returns whether that happened in time."""
+        deadline = time.monotonic() + timeout
+        while self.queue.unfinished_tasks:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def close(self, timeout: float = 5.0):
+        """Sends the buffered records and stops the client."""
+        self.exit.set()
+        self.join(timeout)
+        self.transport.close()
+
+
+def query(address: str, cpu: Optional[str] = None, model: Optional[str] = None, test: Optional[str] = None) -> list[dict[str, Any]]:
+    """Returns the fleet-wide statistics per test and CPU model from the aggregator at address."""
+    transport = SocketTransport(address)
+    try:
+        reply = transport.request(
+            {"type": "query", "cpu": cpu, "model": model, "test": test})
+    finally:
+        transport.close()
+    if not reply.get("ok"):
+        raise RuntimeError(reply.get("error"))
+    return reply["results"]
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ReporterAggregator",
+        description="Collects the cases of many test runs and answers fleet-wide queries.",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run the aggregator")
+    serve.add_argument("address",
+                       help="host:port or the path of a Unix socket to listen on")
+
+    query_parser = commands.add_parser(
+        "query", help="print the energy per test per CPU model")
+    query_parser.add_argument("address",
+                              help="host:port or the path of a Unix socket of the aggregator")
+    query_parser.add_argument("--cpu", help="only this CPU model")
+    query_parser.add_argument("--model", help="only this power model")
+    query_parser.add_argument("--test", help="only this test")
+    query_parser.add_argument("--json", action="store_true",
+                              help="print the results as JSON")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _parser().parse_args()
+    if args.command == "serve":
+        logging.basicConfig(level=logging.INFO)
+        server = AggregatorServer(args.address)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            server.shutdown()
+    else:
+        results = query(args.address, args.cpu, args.model, args.test)
+        if args.json:
+            print(json.dumps(results, indent=4))
+        else:
+            for row in results:
+                energy = row.get("energy", {})
+                print(f"{row['cpu']:<40} {row['test']:<40} {row['hosts']:>5} hosts "
+                      f"{energy.get('n', 0):>6} runs {energy.get('mean', 0):>10.4f} J "
+                      f"± {energy.get('std', 0):.4f}")
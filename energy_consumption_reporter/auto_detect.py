@@ -134,9 +134,43 @@ def get_cpu_info_linux(logger):
         logger.info(
             '/proc/meminfo not accesible on system. Could not check for Memory info. Defaulting to None.')
 
+    try:
+        # inside a container the host's CPUs and memory are not available to us
+        from energy_consumption_reporter.cgroup import apply_cgroup_limits, current_cgroup
+        data = apply_cgroup_limits(data, current_cgroup(), logger)
+    except Exception as err:
+        logger.info('Exception: %s', err)
+        logger.info('Could not check for cgroup limits.')
+
     return data
 
 
+def get_cpu_name() -> Optional[str]:
+    """Returns the model name of the CPU, or None if unknown."""
+    try:
+        if psutil.WINDOWS:
+            c = wmi.WMI()
+            processors = c.Win32_Processor()
+            return processors[0].Name.strip() if processors else None
+
+        cpuinfo = subprocess.check_output(
+            'lscpu', encoding='UTF-8', stderr=subprocess.DEVNULL)
+        match = re.search(r'Model name:\s*(.*)', cpuinfo)
+        if match:
+            return match.group(1).strip()
+    except Exception:
+        pass
+
+    try:
+        with open('/proc/cpuinfo') as file:
+            match = re.search(r'model name\s*:\s*(.*)', file.read())
+        if match:
+            return match.group(1).strip()
+    except OSError:
+        pass
+    return platform.processor() or None
+
+
 def get_cpu_make():
     processor_name = platform.processor().lower()
     if 'intel' in processor_name:
@@ -0,0 +1,174 @@
+import json
+import logging
+import os
+import platform
+import socket
+import time
+from typing import Any, Callable, Optional
+
+import numpy as np
+import psutil
+
+from energy_consumption_reporter.cgroup import CgroupSampler
+from energy_consumption_reporter.sampler import PowerSampler
+
+logger = logging.getLogger(__name__)
+
+IDLE = "idle"
+HARNESS = "harness"
+
+
+def default_cache_path() -> str:
+    cache_dir = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_dir, "energy_consumption_reporter", "baseline.json")
+
+
+def host_key(model_name: str, mode: str = HARNESS, zero_offset: bool = False, cgroup=None) -> str:
+    """Returns the cache key of a baseline for this host, model, mode and cgroup.
+
+    The zero offset changes the output of the model, so baselines measured
+    with and without it are cached separately.
+    """
+    return "|".join([socket.gethostname(), platform.machine(), platform.processor() or "unknown",
+                     str(psutil.cpu_count()), model_name, mode]
+                    + (["zero_offset"] if zero_offset else [])
+                    + ([f"cgroup={cgroup.path}"] if cgroup is not None else []))
+
+
+class Baseline:
+    def __init__(self, power: float, variance: float, samples: int, duration: float, mode: str = IDLE, timestamp: Optional[float] = None):
+        self.power = power  # in W
+        self.variance = variance  # in W^2
+        self.samples = samples
+        self.duration = duration  # in s
+        self.mode = mode
+        self.timestamp = time.time() if timestamp is None else timestamp
+
+    def energy(self, time_ms: float) -> float:
+        """Returns the baseline energy in J over time_ms milliseconds."""
+        return self.power * time_ms / 1000
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "power": self.power,
+            "variance": self.variance,
+            "samples": self.samples,
+            "duration": self.duration,
+            "mode": self.mode,
+            "timestamp": self.timestamp,
+        }
+
+    @staticmethod
+    def from_dict(data: dict[str, Any]) -> "Baseline":
+        return Baseline(**data)
+
+
+def measure_baseline(model, duration: float = 10.0, interval: float = 0.2, mode: str = HARNESS, cgroup=None) -> Baseline:
+    """Samples the idle power of the machine.
+
+    Keyword arguments:
+    model -- object with a predict(utilization) method returning Watts
+    duration -- calibration time in seconds
+    interval -- time between two samples in seconds
+    mode -- HARNESS samples this process (or cgroup) while it does no work;
+            it does not include the measuring process of the cases, which
+            EnergyTester.set_baseline calibrates through instead. IDLE samples
+            the utilization of the whole machine, which includes background
+            load that is not part of the energy of the cases
+    cgroup -- in HARNESS mode, sample this cgroup instead of this process
+    """
+    logger.info('Calibrating %s baseline for %.1f s', mode, duration)
+    wattages = []
+    power_sampler = PowerSampler(
+        model) if mode == HARNESS and cgroup is None else None
+    cgroup_sampler = CgroupSampler(
+        [cgroup]) if mode == HARNESS and cgroup is not None else None
+    if mode == IDLE:
+        psutil.cpu_percent(interval=None)
+
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        if power_sampler is not None:
+            time.sleep(interval)
+            wattages.append(power_sampler.sample().wattage)
+        elif cgroup_sampler is not None:
+            time.sleep(interval)
+            utilization = cgroup_sampler.sample().get(cgroup.path)
+            if utilization is not None:
+                wattages.append(float(model.predict(float(utilization))))
+        else:
+            utilization = psutil.cpu_percent(interval=interval)
+            wattages.append(float(model.predict(float(utilization))))
+
+    if len(wattages) == 0:
+        raise Exception("No baseline measurements were taken")
+
+    return Baseline(power=float(np.mean(wattages)),
+                    variance=float(np.var(wattages, ddof=1)) if len(
+                        wattages) > 1 else 0.0,
+                    samples=len(wattages),
+                    duration=duration,
+                    mode=mode)
+
+
+class BaselineCache:
+    """Host-keyed JSON file with baselines that expire after max_age seconds.
+
+    Keyword arguments:
+    path -- location of the cache file (default: in the user's cache directory)
+    max_age -- seconds after which a cached baseline is measured again
+    """
+
+    def __init__(self, path: Optional[str] = None, max_age: float = 24 * 60 * 60):
+        self.path = path or default_cache_path()
+        self.max_age = max_age
+
+    def _load(self) -> dict[str, Any]:
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str) -> Optional[Baseline]:
+        data = self._load().get(key)
+        if data is None:
+            return None
+        baseline = Baseline.from_dict(data)
+        if time.time() - baseline.timestamp > self.max_age:
+            return None
+        return baseline
+
+    def put(self, key: str, baseline: Baseline):
+        data = self._load()
+        data[key] = baseline.to_dict()
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # write atomically, sessions on the same host may share the cache
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w+') as file:
+            file.write(json.dumps(data, indent=4))
+        os.replace(tmp_path, self.path)
+
+
+def get_baseline(model, model_name: str, duration: float = 10.0, mode: str = HARNESS, cache: Optional[BaselineCache] = None, refresh: bool = False, zero_offset: bool = False, cgroup=None, measure: Optional[Callable[[], Baseline]] = None) -> Baseline:
+    """Returns the cached baseline of this host, calibrating it when missing or expired.
+
+    zero_offset must match the zero offset setting of model. measure replaces
+    measure_baseline for the calibration, so a caller can calibrate through
+    its own measuring path.
+    """
+    cache = cache or BaselineCache()
+    key = host_key(model_name, mode, zero_offset, cgroup)
+    baseline = None if refresh else cache.get(key)
+    if baseline is not None:
+        logger.info('Using cached baseline of %.2f W', baseline.power)
+        return baseline
+
+    if measure is not None:
+        baseline = measure()
+    else:
+        baseline = measure_baseline(model, duration, mode=mode, cgroup=cgroup)
+    cache.put(key, baseline)
+    logger.info('Calibrated baseline of %.2f W', baseline.power)
+    return baseline
@@ -0,0 +1,332 @@
+import logging
+import math
+import os
+import time
+from typing import TYPE_CHECKING, Optional
+
+import numpy as np
+import psutil
+
+if TYPE_CHECKING:
+    # auto_detect imports pandas, which is too slow to load in the sampler
+    from energy_consumption_reporter.auto_detect import CPUInfo
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as file:
+            return file.read().strip()
+    except OSError:
+        return None
+
+
+def _count_cpuset(cpus: str) -> int:
+    """Returns the amount of CPUs in a cpuset list such as "0-3,8,10-11"."""
+    count = 0
+    for part in cpus.split(","):
+        if not part:
+            continue
+        if "-" in part:
+            first, last = part.split("-")
+            count += int(last) - int(first) + 1
+        else:
+            count += 1
+    return count
+
+
+class Cgroup:
+    """Reads CPU usage and limits of a single cgroup (v1 or v2).
+
+    Keyword arguments:
+    path -- path of the cgroup relative to the cgroup root (e.g. "/kubepods/pod1")
+    root -- mount point of the cgroup filesystem
+    controller_paths -- v1 only, per controller paths that differ from path
+    """
+
+    def __init__(self, path: str = "/", root: str = CGROUP_ROOT, controller_paths: Optional[dict[str, str]] = None):
+        self.path = path
+        self.root = root
+        self.controller_paths = controller_paths or {}
+        self.version = 2 if os.path.exists(
+            os.path.join(root, "cgroup.controllers")) else 1
+
+    def _file(self, controller: str, name: str) -> str:
+        # v1 mounts every controller in its own hierarchy
+        if self.version == 1:
+            hierarchy = os.path.join(self.root, controller)
+            path = self.controller_paths.get(controller, self.path)
+        else:
+            hierarchy = self.root
+            path = self.path
+        return os.path.join(hierarchy, path.lstrip("/"), name)
+
+    def exists(self) -> bool:
+        """Returns whether the cgroup directory exists for the CPU accounting controller."""
+        if self.version == 2:
+            return os.path.isdir(os.path.dirname(self._file("cpu", "")))
+        return any(os.path.isdir(os.path.dirname(self._file(controller, "")))
+                   for controller in ("cpuacct", "cpu,cpuacct", "cpu"))
+
+    def usage_ns(self) -> Optional[int]:
+        """Returns the total CPU time consumed by the cgroup in ns."""
+        if self.version == 2:
+            stat = _read(self._file("cpu", "cpu.stat"))
+            if stat is None:
+                return None
+            for line in stat.splitlines():
+                key, _, value = line.partition(" ")
+                if key == "usage_usec":
+                    return int(value) * 1000
+            return None
+
+        for controller in ("cpuacct", "cpu,cpuacct"):
+            usage = _read(self._file(controller, "cpuacct.usage"))
+            if usage is not None:
+                return int(usage)
+        return None
+
+    def cpu_quota(self) -> Optional[float]:
+        """Returns the CPU limit in amount of CPUs, or None when unlimited."""
+        if self.version == 2:
+            cpu_max = _read(self._file("cpu", "cpu.max"))
+            if cpu_max is None:
+                return None
+            quota, _, period = cpu_max.partition(" ")
+            if quota == "max":
+                return None
+            return int(quota) / int(period or 100_000)
+
+        for controller in ("cpu", "cpu,cpuacct"):
+            quota = _read(self._file(controller, "cpu.cfs_quota_us"))
+            period = _read(self._file(controller, "cpu.cfs_period_us"))
+            if quota is not None and period is not None:
+                if int(quota) <= 0:
+                    return None
+                return int(quota) / int(period)
+        return None
+
+    def cpuset_count(self) -> Optional[int]:
+        """Returns the amount of CPUs the cgroup may be scheduled on."""
+        if self.version == 2:
+            cpus = _read(self._file("cpuset", "cpuset.cpus.effective"))
+        else:
+            cpus = _read(self._file("cpuset", "cpuset.effective_cpus")) or \
+                _read(self._file("cpuset", "cpuset.cpus"))
+        if not cpus:
+            return None
+        return _count_cpuset(cpus)
+
+    def effective_cpus(self) -> float:
+        """Returns the amount of CPUs available to the cgroup."""
+        limits = [limit for limit in (self.cpu_quota(), self.cpuset_count())
+                  if limit is not None]
+        if limits:
+            return min(limits)
+        return float(psutil.cpu_count())
+
+    def memory_limit(self) -> Optional[int]:
+        """Returns the memory limit of the cgroup in bytes, or None when unlimited."""
+        if self.version == 2:
+            limit = _read(self._file("memory", "memory.max"))
+            if limit is None or limit == "max":
+                return None
+            return int(limit)
+
+        limit = _read(self._file("memory", "memory.limit_in_bytes"))
+        if limit is None:
+            return None
+        # v1 reports "unlimited" as a huge page-aligned number
+        if int(limit) >= psutil.virtual_memory().total:
+            return None
+        return int(limit)
+
+    def is_limited(self) -> bool:
+        return self.cpu_quota() is not None or self.memory_limit() is not None
+
+
+def current_cgroup(root: str = CGROUP_ROOT, proc_path: str = "/proc/self/cgroup") -> Cgroup:
+    """Returns the cgroup the current process runs in."""
+    content = _read(proc_path) or ""
+    version = Cgroup("/", root).version
+    path = "/"
+    controller_paths = {}
+    for line in content.splitlines():
+        # format: hierarchy-ID:controller-list:cgroup-path
+        _, controllers, cgroup_path = line.split(":", 2)
+        if version == 2:
+            if controllers == "":
+                path = cgroup_path
+        elif controllers:
+            controller_paths[controllers] = cgroup_path
+            for controller in controllers.split(","):
+                controller_paths[controller] = cgroup_path
+    # without a cgroup namespace the container sees the host's path for its
+    # cgroup, while its own cgroup is mounted at the root of the hierarchy
+    if version == 2:
+        if not os.path.isdir(os.path.join(root, path.lstrip("/"))):
+            path = "/"
+    else:
+        controller_paths = {controller: cgroup_path if os.path.isdir(
+            os.path.join(root, controller, cgroup_path.lstrip("/"))) else "/"
+            for controller, cgroup_path in controller_paths.items()}
+        path = controller_paths.get("cpuacct", controller_paths.get("cpu", "/"))
+    return Cgroup(path, root, controller_paths)
+
+
+def cpu_count() -> float:
+    """Returns the amount of CPUs available to this process.
+
+    Inside a container this is the cgroup limit instead of the host's CPUs.
+    """
+    if psutil.LINUX:
+        try:
+            return current_cgroup().effective_cpus()
+        except Exception as err:
+            logger.debug('Could not read cgroup CPU limit: %s', err)
+    return float(psutil.cpu_count())
+
+
+def list_cgroups(parent: str = "/", root: str = CGROUP_ROOT) -> list[Cgroup]:
+    """Returns parent and all cgroups below it that report CPU usage."""
+    if not Cgroup(parent, root).exists():
+        raise FileNotFoundError(f"cgroup {parent} does not exist in {root}")
+    hierarchy = root
+    if Cgroup(parent, root).version == 1:
+        # v1 may mount cpuacct on its own or combined with the cpu controller
+        for controller in ("cpuacct", "cpu,cpuacct"):
+            hierarchy = os.path.join(root, controller)
+            if os.path.isdir(hierarchy):
+                break
+
+    cgroups = []
+    for dir_path, _, _ in os.walk(os.path.join(hierarchy, parent.lstrip("/"))):
+        path = os.path.relpath(dir_path, hierarchy).replace(os.sep, "/")
+        cgroup = Cgroup("/" if path == "." else "/" + path, root)
+        if cgroup.usage_ns() is not None:
+            cgroups.append(cgroup)
+    return cgroups
+
+
+class CgroupSampler:
+    """Computes the CPU utilization of one or more cgroups between two calls.
+
+    Utilization is the CPU time used by a cgroup divided by the CPU time it
+    was allowed to use (its quota or cpuset), in percent. This replaces
+    normalizing by psutil.cpu_count(), which counts all CPUs of the host.
+
+    Keyword arguments:
+    cgroups -- the cgroups to sample
+    """
+
+    def __init__(self, cgroups: list[Cgroup]):
+        self.cgroups = cgroups
+        self.cpus = {cgroup.path: cgroup.effective_cpus() for cgroup in cgroups}
+        self.last_time = time.monotonic_ns()
+        self.last_usage = {cgroup.path: cgroup.usage_ns() for cgroup in cgroups}
+
+    def sample(self) -> dict[str, float]:
+        now = time.monotonic_ns()
+        elapsed = now - self.last_time
+        self.last_time = now
+
+        utilizations = {}
+        for cgroup in self.cgroups:
+            usage = cgroup.usage_ns()
+            last_usage = self.last_usage.get(cgroup.path)
+            self.last_usage[cgroup.path] = usage
+            if usage is None or last_usage is None or elapsed <= 0:
+                continue
+            utilization = (usage - last_usage) / \
+                (elapsed * self.cpus[cgroup.path]) * 100
+            utilizations[cgroup.path] = min(max(utilization, 0.0), 100.0)
+        return utilizations
+
+
+def apply_cgroup_limits(data: "CPUInfo", cgroup: Cgroup, logger: logging.Logger) -> "CPUInfo":
+    """Replaces the host-wide thread, core and memory amounts by the cgroup limits."""
+    quota = cgroup.cpu_quota()
+    cpuset = cgroup.cpuset_count()
+    if quota is not None or (cpuset is not None and data.threads and cpuset < data.threads):
+        cpus = cgroup.effective_cpus()
+        data.threads = max(math.ceil(cpus), 1)
+        if data.cores:
+            data.cores = min(data.cores, data.threads)
+        else:
+            data.cores = data.threads
+        logger.info('Found cgroup CPU limit: %.2f CPUs', cpus)
+
+    mem = cgroup.memory_limit()
+    if mem is not None:
+        data.mem = math.ceil(mem / 1024 / 1024 / 1024)
+        logger.info('Found cgroup memory limit: %d GB', data.mem)
+
+    return data
+
+
+def measure_cgroups(model, cgroups: list[Cgroup], duration: float, interval: float = 0.2) -> dict[str, dict[str, float]]:
+    """Measures the energy of every cgroup with a single sampler.
+
+    Keyword arguments:
+    model -- object with a predict(utilization) method returning Watts
+    cgroups -- the cgroups to measure
+    duration -- measuring time in seconds
+    interval -- time between two samples in seconds
+    """
+    for cgroup in cgroups:
+        if not cgroup.exists():
+            raise FileNotFoundError(
+                f"cgroup {cgroup.path} does not exist in {cgroup.root}")
+    sampler = CgroupSampler(cgroups)
+    measurements: dict[str, list[tuple[int, float, float]]] = {
+        cgroup.path: [] for cgroup in cgroups}
+
+    end = time.monotonic() + duration
+    while time.monotonic() < end:
+        time.sleep(interval)
+        now = time.time_ns()
+        for path, utilization in sampler.sample().items():
+            measurements[path].append(
+                (now, float(model.predict(utilization)), utilization))
+
+    results = {}
+    for path, values in measurements.items():
+        if len(values) == 0:
+            continue
+        times = [x[0] / 1_000_000_000 for x in values]
+        wattages = [x[1] for x in values]
+        results[path] = {
+            "energy": float(np.trapz(wattages, times)),
+            "avg_power": float(np.mean(wattages)),
+            "avg_cpu_util": float(np.mean([x[2] for x in values])),
+        }
+    return results
+
+
+def _parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        prog="CgroupEnergy",
+        description="Measures the energy of all cgroups below a parent cgroup.",
+    )
+    parser.add_argument("parent", nargs="?", default="/",
+                        help="cgroup path to measure, including all its children")
+    parser.add_argument("--root", default=CGROUP_ROOT,
+                        help="mount point of the cgroup filesystem")
+    parser.add_argument("--duration", type=float, default=10.0,
+                        help="measuring time in seconds")
+    return parser
+
+
+if __name__ == "__main__":
+    import json
+
+    from energy_consumption_reporter.energy_model import EnergyModel
+
+    args = _parser().parse_args()
+    print(json.dumps(measure_cgroups(EnergyModel(), list_cgroups(
+        args.parent, args.root), args.duration), indent=4))
@@ -0,0 +1,59 @@
+import glob
+import os
+import re
+
+import numpy as np
+
+CPU_ROOT = "/sys/devices/system/cpu"
+
+
+class CPUFreqReader:
+    """Reads the current frequency of every core from sysfs.
+
+    The scaling_cur_freq files are opened once and read with pread, so a
+    reading costs one system call per core and no path lookups.
+
+    Keyword arguments:
+    root -- sysfs directory containing the cpu<N> directories
+    """
+
+    def __init__(self, root: str = CPU_ROOT):
+        found = []
+        for path in glob.glob(os.path.join(root, "cpu[0-9]*", "cpufreq", "scaling_cur_freq")):
+            match = re.search(r"cpu(\d+)", os.path.relpath(path, root))
+            if match:
+                found.append((int(match.group(1)), path))
+        if len(found) == 0:
+            raise FileNotFoundError(f"No scaling_cur_freq files found in {root}")
+
+        found.sort()
+        self.cpus = [cpu for cpu, _ in found]
+        self.fds = [os.open(path, os.O_RDONLY) for _, path in found]
+
+    def read(self) -> np.ndarray:
+        """Returns the current frequency of every core in MHz."""
+        return np.array([int(os.pread(fd, 32, 0)) for fd in self.fds], dtype=float) / 1000
+
+    def close(self):
+        for fd in self.fds:
+            os.close(fd)
+        self.fds = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def weighted_frequency(freqs: np.ndarray, utilizations: np.ndarray) -> float:
+    """Returns the average core frequency weighted by the utilization of each core.
+
+    Idle cores hardly draw power, so their (often low) frequency should not
+    pull down the frequency of the cores that do the work.
+    """
+    freqs = np.asarray(freqs, dtype=float)
+    utilizations = np.asarray(utilizations, dtype=float)
+    if len(utilizations) != len(freqs) or utilizations.sum() <= 0:
+        return float(freqs.mean())
+    return float(np.dot(freqs, utilizations) / utilizations.sum())
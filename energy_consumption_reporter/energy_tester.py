@@ -1,5 +1,8 @@
 import inspect
 import logging
+import math
+import statistics
+import time
 from enum import Enum
 from multiprocessing import Pipe
 from multiprocessing.managers import BaseManager
@@ -11,6 +14,9 @@ from functools import wraps
 from energy_consumption_reporter.measure_process import MeasureProcess
 from energy_consumption_reporter.singleton import SingletonMeta
 from energy_consumption_reporter.report_builder import ReportBuilder
+from energy_consumption_reporter import throughput
+from energy_consumption_reporter.baseline import HARNESS, IDLE, Baseline, BaselineCache, get_baseline
+from energy_consumption_reporter.profiler import EnergyProfiler
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.StreamHandler())
@@ -31,11 +37,18 @@ class EnergyTester(metaclass=SingletonMeta):
         self.process = None
         self.save_report: OutputType = OutputType.NONE
         self.zero_offset = False  # EXPERIMENTAL
+        self.cgroup = None
+        self.record_trace = False
+        self.baseline = None
+        self.baseline_args = None
+        self.thermal_scheduler = None
+        self.cpu_freq = False
 
         BaseManager.register('model', EnergyModel)
         manager = BaseManager()
         manager.start()
         self.model = manager.model()  # type: ignore
+        self.model_class = EnergyModel
 
         self.model.set_zero_offset(self.zero_offset)
 
@@ -65,13 +78,33 @@ class EnergyTester(metaclass=SingletonMeta):
             return wrapper_func
         return decorate
 
+    @staticmethod
+    def energy_throughput_test(repeat=5, min_time=2.0):
+        def decorate(func):
+            @wraps(func)
+            def wrapper_func(*args, **kwargs):
+                EnergyTester().test_throughput(func, repeat, min_time)
+
+            return wrapper_func
+        return decorate
+
     # Set custom model (Default = EnergyModel)
     def set_model(self, model):
+        if self.cpu_freq and not getattr(model, "takes_frequency", False):
+            logger.warning(
+                "%s does not take the CPU frequency as input, disabling set_cpu_freq", model.__name__)
+            self.cpu_freq = False
         BaseManager.register("model", model)
         manager = BaseManager()
         manager.start()
         self.model = manager.model()  # type: ignore
+        self.model_class = model
         self.report_builder.set_model_name(model.__name__)
+        if self.zero_offset:
+            self.model.set_zero_offset(True)
+        if self.baseline_args is not None:
+            # the baseline must be measured with the same model as the cases
+            self.set_baseline(*self.baseline_args)
 
     # Set whether to save report (Default = False)
     def set_save_report(self, save_report: OutputType):
@@ -88,10 +121,77 @@ class EnergyTester(metaclass=SingletonMeta):
     def set_report_description(self, description: str):
         self.report_builder.set_description(description)
 
-    # Set custom report description
+    # Set whether to subtract the model's prediction at 0% utilization (EXPERIMENTAL, see set_baseline)
     def set_zero_offset(self, offset: bool):
+        if offset:
+            logger.warning(
+                "The zero offset is the model's output at 0% utilization, not the idle power of this machine. Consider set_baseline instead.")
         self.zero_offset = offset
         self.model.set_zero_offset(offset)
+        if self.baseline_args is not None:
+            # the baseline must be measured with the same model output as the cases
+            self.set_baseline(*self.baseline_args)
+
+    # Calibrate (or load the cached) idle baseline and report net-of-baseline energy (Default = no baseline)
+    def set_baseline(self, duration=10.0, max_age=24 * 60 * 60, mode=HARNESS, cache_path=None, refresh=False):
+        if mode == IDLE:
+            logger.warning(
+                "The idle baseline includes background load of the whole machine, which the energy of the cases does not. Its net_energy may be negative.")
+        self.baseline_args = (duration, max_age, mode, cache_path, refresh)
+        # the harness baseline is measured the same way as the cases, so it
+        # includes the measuring process and the model RPCs
+        measure = (lambda: self._measure_baseline(duration)
+                   ) if mode == HARNESS else None
+        self.baseline = get_baseline(self.model, self.report_builder.model_name, duration, mode,
+                                     BaselineCache(cache_path, max_age), refresh, self.zero_offset, self.cgroup, measure)
+        self.report_builder.set_baseline(self.baseline)
+
+    # Measure the CPU usage of a whole cgroup instead of this process (Default = None)
+    def set_cgroup(self, cgroup):
+        if cgroup is not None and not cgroup.exists():
+            raise FileNotFoundError(
+                f"cgroup {cgroup.path} does not exist in {cgroup.root}")
+        self.cgroup = cgroup
+        if self.baseline_args is not None:
+            # the baseline must be measured on the same utilization as the cases
+            self.set_baseline(*self.baseline_args)
+
+    # Set whether to store the utilization trace of every iteration in the report (Default = False)
+    def set_record_trace(self, record_trace: bool):
+        self.record_trace = record_trace
+
+    # Wait for the CPU to cool down between iterations and flag throttled iterations, set while idle (Default = None)
+    def set_thermal_scheduler(self, scheduler):
+        # calibrate now, before any test has heated up the CPU
+        if scheduler is not None and not scheduler.is_calibrated:
+            scheduler.calibrate()
+        self.thermal_scheduler = scheduler
+
+    # Feed the per-core frequency into a frequency-aware model (Default = False)
+    # The default EnergyModel is swapped for FrequencyEnergyModel and back, a custom model needs takes_frequency
+    def set_cpu_freq(self, cpu_freq: bool):
+        from energy_consumption_reporter.frequency_model import FrequencyEnergyModel
+        self.cpu_freq = False
+        if not cpu_freq:
+            if self.model_class is FrequencyEnergyModel:
+                self.set_model(EnergyModel)
+            return
+
+        takes_frequency = getattr(self.model_class, "takes_frequency", False)
+        if not takes_frequency and self.model_class is not EnergyModel:
+            raise Exception(
+                f"{self.model_class.__name__} does not take the CPU frequency as input")
+        # set first, so set_model measures a baseline with the frequency input
+        self.cpu_freq = True
+        if not takes_frequency:
+            self.set_model(FrequencyEnergyModel)
+
+    # Stream every case to a report aggregator at "host:port" or a Unix socket path (Default = None)
+    def set_aggregator(self, address: str):
+        from energy_consumption_reporter.aggregator import AggregatorClient, SocketTransport
+        client = AggregatorClient(SocketTransport(address))
+        client.start()
+        self.report_builder.set_aggregator(client)
 
     def test(self, func, times, func_name=None, include_case=True):
         if func_name is None:
@@ -100,6 +200,11 @@ class EnergyTester(metaclass=SingletonMeta):
         energy_list = []
         power_list = []
         time_list = []
+        trace_list = []
+        temp_list = []
+        freq_list = []
+        throttled_list = []
+        wait_list = []
         passed = True
         stop = False
         result = None
@@ -111,7 +216,11 @@ class EnergyTester(metaclass=SingletonMeta):
             nth = i + 1
             logging.debug(f"Test {func_name}, Iteration: {nth}")
 
-            process = MeasureProcess(self.conn1, self.model)
+            if self.thermal_scheduler is not None:
+                wait_list.append(
+                    int(self.thermal_scheduler.wait() * 1000))
+
+            process = MeasureProcess(self.conn1, self.model, cgroup=self.cgroup, cpu_freq=self.cpu_freq)
             process.start()
             reason = ""
 
@@ -143,6 +252,12 @@ class EnergyTester(metaclass=SingletonMeta):
             energy_list.append(values[1])
             power_list.append(values[2])
             avg_cpu_util = values[4]
+            trace_list.append(values[5])
+            temp_list.append(values[3])
+            freq_list.append(values[6])
+
+        if self.thermal_scheduler is not None:
+            throttled_list = self.thermal_scheduler.throttled(freq_list)
 
         if include_case:
             self.report_builder.add_case(time_list=time_list,
@@ -151,15 +266,184 @@ class EnergyTester(metaclass=SingletonMeta):
                                          avg_cpu_util=avg_cpu_util,
                                          test_name=func_name,
                                          passed=passed,
-                                         reason=reason)
+                                         reason=reason,
+                                         trace_list=trace_list if self.record_trace else None,
+                                         extra=self._thermal_fields(temp_list, freq_list, throttled_list, wait_list))
 
         if self.save_report == OutputType.JSON or self.save_report == OutputType.PRINT_JSON:
             self.report_builder.save_report()
 
-        return {"time": time_list, "energy": energy_list, "power": power_list, "cpu_util": avg_cpu_util, "result": result, "exception": error}
+        return {"time": time_list, "energy": energy_list, "power": power_list, "cpu_util": avg_cpu_util, "cpu_temp": temp_list, "cpu_freq": freq_list, "throttled": throttled_list, "result": result, "exception": error}
+
+    def _thermal_fields(self, temp_list, freq_list, throttled_list, wait_list):
+        fields = {"cpu_temp": temp_list, "cpu_freq": freq_list}
+        if self.thermal_scheduler is not None:
+            fields.update({"throttled": throttled_list, "wait_time": wait_list})
+        return fields
+
+    def test_throughput(self, func, repeat=5, min_time=2.0, func_name=None, include_case=True):
+        """Measures the energy per operation of func by calling it in a tight loop.
+
+        The amount of loops is calibrated so every measured loop lasts at
+        least min_time seconds. The time and energy of an equally long empty
+        loop are measured once and subtracted from every measured loop.
+        Loops are timed in this process, and their energy is the average
+        power during the loop times that time, since the sampling windows of
+        the measuring process do not line up with the loop.
+
+        Keyword arguments:
+        func -- function without arguments to measure
+        repeat -- amount of measured loops
+        min_time -- minimal duration of a measured loop in seconds
+        """
+        if func_name is None:
+            func_name = func.__qualname__
+
+        energy_list = []
+        power_list = []
+        time_list = []
+        passed = True
+        reason = ""
+        avg_cpu_util = 0.0
+
+        loops = 0
+        empty_time = 0.0
+        empty_energy = 0.0
+        try:
+            loops = throughput.autorange(func, min_time)
+            logging.debug(f"Test {func_name}, Loops: {loops}")
+
+            # calibrate the cost of the loop itself
+            empty_loops = throughput.empty_loop_loops(loops, min_time)
+            elapsed = []
+            values = self._measure(
+                lambda: elapsed.append(throughput.run_loop(throughput._noop, empty_loops)))
+            empty_time = elapsed[-1] * 1000 / empty_loops
+            empty_energy = values[2] * elapsed[-1] / empty_loops
+
+            for i in range(repeat):
+                logging.debug(f"Test {func_name}, Repeat: {i + 1}")
+                values = self._measure(
+                    lambda: elapsed.append(throughput.run_loop(func, loops)))
+                time_list.append(elapsed[-1] * 1000)
+                energy_list.append(values[2] * elapsed[-1])
+                power_list.append(values[2])
+                avg_cpu_util = values[4]
+        except AssertionError as e:
+            reason = str(e)
+            passed = False
+
+        summary = throughput.summarize(
+            loops, time_list, energy_list, empty_time, empty_energy)
+
+        if include_case:
+            self.report_builder.add_case(time_list=time_list,
+                                         energy_list=energy_list,
+                                         power_list=power_list,
+                                         avg_cpu_util=avg_cpu_util,
+                                         test_name=func_name,
+                                         passed=passed,
+                                         reason=reason,
+                                         extra={"throughput": summary})
+
+        if self.save_report == OutputType.JSON or self.save_report == OutputType.PRINT_JSON:
+            self.report_builder.save_report()
+
+        return {"time": time_list, "energy": energy_list, "power": power_list, "cpu_util": avg_cpu_util, "throughput": summary}
+
+    def profile(self, func, interval=0.01, top=10, collapsed_path=None, func_name=None, include_case=True):
+        """Runs func once with the sampling energy profiler.
+
+        The report case gets a table of the top functions by energy, and the
+        energy per call stack is written to collapsed_path in the collapsed
+        stack format when given (e.g. for flamegraph.pl).
+
+        Keyword arguments:
+        func -- function without arguments to profile
+        interval -- time between two stack samples in seconds
+        top -- amount of functions in the table
+        collapsed_path -- file to write the collapsed stacks to
+        """
+        if func_name is None:
+            func_name = func.__qualname__
+
+        passed = True
+        reason = ""
+        result = None
+        error = None
+
+        profiler = EnergyProfiler(self.model, interval=interval)
+        start = time.time_ns()
+        profiler.start()
+        try:
+            result = func()
+        except AssertionError as e:
+            error = e
+            reason = str(e)
+            passed = False
+        finally:
+            profiler.terminate()
+            profiler.join()
+        total_time_ms = math.ceil((time.time_ns() - start) / 1_000_000)
+
+        if collapsed_path is not None:
+            profiler.write_collapsed(collapsed_path)
+
+        power = profiler.energy / (total_time_ms / 1000) if total_time_ms else 0.0
+        avg_cpu_util = sum(profiler.utilizations) / \
+            len(profiler.utilizations) if profiler.utilizations else 0.0
+        profile = {
+            "interval": interval,
+            "samples": profiler.samples,
+            "overhead": profiler.overhead * 1000,
+            "top": profiler.top(top),
+        }
+
+        if include_case:
+            self.report_builder.add_case(time_list=[total_time_ms],
+                                         energy_list=[profiler.energy],
+                                         power_list=[power],
+                                         avg_cpu_util=avg_cpu_util,
+                                         test_name=func_name,
+                                         passed=passed,
+                                         reason=reason,
+                                         extra={"profile": profile})
+
+        if self.save_report == OutputType.JSON or self.save_report == OutputType.PRINT_JSON:
+            self.report_builder.save_report()
+
+        return {"time": [total_time_ms], "energy": [profiler.energy], "power": [power], "cpu_util": avg_cpu_util, "profile": profile, "result": result, "exception": error}
+
+    def _measure_baseline(self, duration):
+        # one measurement per second of sleep, so the variance has samples
+        windows = max(int(duration), 2)
+        powers = []
+        for _ in range(windows):
+            values = self._measure(lambda: time.sleep(duration / windows))
+            powers.append(values[1] / (values[0] / 1000))
+
+        return Baseline(power=statistics.fmean(powers),
+                        variance=statistics.variance(powers),
+                        samples=len(powers),
+                        duration=duration,
+                        mode=HARNESS)
+
+    def _measure(self, func):
+        process = MeasureProcess(self.conn1, self.model, cgroup=self.cgroup, cpu_freq=self.cpu_freq)
+        process.start()
+        try:
+            func()
+        finally:
+            process.terminate()
+            process.join()
+            values = self.conn2.recv()
+
+        if isinstance(values, Exception):
+            raise values
+        return values
 
     def start(self):
-        self.process = MeasureProcess(self.conn1, self.model)
+        self.process = MeasureProcess(self.conn1, self.model, cgroup=self.cgroup, cpu_freq=self.cpu_freq)
         self.process.start()
 
     def stop(self, exc_type, exc_value, traceback):
@@ -181,6 +465,7 @@ class EnergyTester(metaclass=SingletonMeta):
         energy_list.append(values[1])
         power_list.append(values[2])
         avg_cpu_util = values[4]
+        trace_list = [values[5]]
 
         self.report_builder.add_case(time_list=time_list,
                                      energy_list=energy_list,
@@ -188,4 +473,5 @@ class EnergyTester(metaclass=SingletonMeta):
                                      avg_cpu_util=avg_cpu_util,
                                      test_name=func,
                                      passed=True if exc_type is None else False,
-                                     reason=str(exc_value) if exc_value is not None else "")
+                                     reason=str(exc_value) if exc_value is not None else "",
+                                     trace_list=trace_list if self.record_trace else None)
@@ -0,0 +1,89 @@
+import logging
+from typing import Optional
+
+import numpy as np
+
+from energy_consumption_reporter.energy_model import EnergyModel
+
+logger = logging.getLogger(__name__)
+
+
+class FrequencyEnergyModel(EnergyModel):
+    """EnergyModel variant that takes the sampled CPU frequency as input.
+
+    HW_CPUFreq is a feature of the SPEC training data, but EnergyModel always
+    fills in the maximum frequency. This variant feeds it the effective
+    frequency measured during the sample instead, so the same utilization at
+    a low or a turbo frequency gives a different power.
+
+    The SPEC data has one nominal frequency per server, so the model learned
+    how power differs between server configurations, not how it changes
+    within the frequency range of one CPU. On setup the response to the
+    frequency is checked, and a warning is logged when the predicted power
+    does not increase with it.
+    """
+
+    # tells EnergyTester.set_cpu_freq that predict_batch takes frequencies
+    takes_frequency = True
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.check_frequency_response()
+
+    def frequency_response(self, utilization: float = 50.0, steps: int = 5) -> list[tuple[float, float]]:
+        """Returns (frequency in MHz, power in W) pairs from half to the full nominal frequency."""
+        if 'HW_CPUFreq' not in self.Z or not self.Z['HW_CPUFreq'][0]:
+            return []
+        max_freq = float(self.Z['HW_CPUFreq'][0])
+        freqs = np.linspace(max_freq / 2, max_freq, steps)
+        powers = self.predict_batch([utilization] * steps, freqs)
+        return [(float(freq), float(power)) for freq, power in zip(freqs, powers)]
+
+    def check_frequency_response(self, tolerance: float = 0.01) -> bool:
+        """Returns whether the predicted power rises with the frequency, warning if not.
+
+        Drops smaller than tolerance (fraction of the power at the nominal
+        frequency) are allowed, since tree models predict in steps.
+        """
+        response = self.frequency_response()
+        if len(response) < 2:
+            logger.warning(
+                'Nominal CPU frequency unknown, the frequency response of the model cannot be checked')
+            return False
+
+        powers = np.array([power for _, power in response])
+        rising = bool(np.all(np.diff(powers) >= -tolerance * abs(powers[-1]))
+                      and powers[-1] > powers[0])
+        if not rising:
+            logger.warning(
+                'The predicted power does not rise with the CPU frequency between %.0f and %.0f MHz (%s W), '
+                'the frequency input of this model may not be meaningful on this machine',
+                response[0][0], response[-1][0], ", ".join(f"{power:.1f}" for power in powers))
+        return rising
+
+    def predict(self, utilization: float, freq: Optional[float] = None):
+        if not self.is_setup:
+            raise Exception("Model not setup")
+
+        Z = self.Z.copy()
+        Z['utilization'] = utilization
+        if freq is not None and 'HW_CPUFreq' in Z:
+            Z['HW_CPUFreq'] = freq
+        predicion = self.model.predict(Z)[0]
+        if self.zero_offset:
+            predicion -= self.zero_prediction
+        return predicion
+
+    def predict_batch(self, utilizations, freqs=None):
+        """Predicts the power for every utilization (and frequency) with a single model call."""
+        if not self.is_setup:
+            raise Exception("Model not setup")
+
+        X = self.Z.loc[self.Z.index.repeat(len(utilizations))].reset_index(drop=True)
+        X['utilization'] = np.asarray(utilizations, dtype=float)
+        if freqs is not None and 'HW_CPUFreq' in X:
+            X['HW_CPUFreq'] = np.asarray(freqs, dtype=float)
+        predictions = self.model.predict(X)
+        if self.zero_offset:
+            predictions = predictions - self.zero_prediction
+        return predictions
@@ -1,23 +1,23 @@
-import json
 import math
 from multiprocessing import Event, Process
-import subprocess
-try:
-    import wmi  # type: ignore
-except ImportError:
-    pass
 import time
 import psutil
 import numpy as np
 
+from energy_consumption_reporter.cgroup import CgroupSampler, cpu_count
+from energy_consumption_reporter.cpufreq import CPUFreqReader, weighted_frequency
+from energy_consumption_reporter.thermal import read_cpu_frequency, read_cpu_temperature
+
 
 class MeasureProcess(Process):
-    def __init__(self, connection, model, *args, **kwargs):
+    def __init__(self, connection, model, *args, cgroup=None, cpu_freq=False, **kwargs):
         super().__init__(*args, **kwargs)
         self.daemon = True
         self.exit = Event()
         self.connection = connection
         self.model = model
+        self.cgroup = cgroup
+        self.cpu_freq = cpu_freq
 
     def run(self):
         try:
@@ -28,47 +28,66 @@ class MeasureProcess(Process):
             start = time.time_ns()
             measurements: list[tuple[int, float]] = []
             cpu_temps = []
+            cpu_freqs = []
             cpu_utils = []
 
             # get parent process
             this_process = psutil.Process()
             parent_process = this_process.parent()
+            cpus = cpu_count()
+            cgroup_sampler = CgroupSampler(
+                [self.cgroup]) if self.cgroup is not None else None
+            # with cpu_freq the model gets the frequency of the busy cores as
+            # input, and all samples are predicted in one batch at the end
+            freq_reader = CPUFreqReader() if self.cpu_freq else None
+            sample_freqs = []
+            if freq_reader is not None:
+                psutil.cpu_percent(percpu=True)
 
             while not self.exit.is_set():
                 # measure the next 0.2 seconds
-                utilization = parent_process.cpu_percent(
-                    interval=0.2) / psutil.cpu_count()
+                if cgroup_sampler is not None:
+                    time.sleep(0.2)
+                    utilization = cgroup_sampler.sample().get(
+                        self.cgroup.path, -1)
+                else:
+                    utilization = parent_process.cpu_percent(
+                        interval=0.2) / cpus
 
                 if utilization < 0 or utilization > 100:
                     continue
 
                 cpu_utils.append(utilization)
                 now = time.time_ns()
-                wattage: float = self.model.predict(float(utilization))
+                if freq_reader is not None:
+                    core_utils = np.asarray(psutil.cpu_percent(percpu=True))
+                    if len(core_utils) > max(freq_reader.cpus):
+                        core_utils = core_utils[freq_reader.cpus]
+                    sample_freqs.append(weighted_frequency(
+                        freq_reader.read(), core_utils))
+                    wattage = 0.0
+                else:
+                    wattage = self.model.predict(float(utilization))
                 measurement = (now, wattage)
                 measurements.append(measurement)
 
-                try:
-                    if psutil.WINDOWS:
-                        c = wmi.WMI()
-                        thermal_zone_info = c.query(
-                            "SELECT * FROM Win32_PerfFormattedData_Counters_ThermalZoneInformation WHERE Name LIKE '%CPU%'")
-                        if len(thermal_zone_info) > 0:
-                            cpu_temp = int(
-                                thermal_zone_info[0].Temperature - 273.15)
-                            cpu_temps.append(cpu_temp)
-                    else:
-                        sensor_data = json.loads(subprocess.check_output(
-                            ["sensors", "-j"]).decode("utf-8"))
-                        cpu_temps.append(int(sensor_data.get(
-                            "k10temp-pci-00c3").get("Tctl").get("temp1_input")))
-                except:
-                    pass
+                cpu_temp = read_cpu_temperature()
+                if cpu_temp is not None:
+                    cpu_temps.append(cpu_temp)
+                cpu_freq = sample_freqs[-1] if freq_reader is not None else read_cpu_frequency()
+                if cpu_freq is not None:
+                    cpu_freqs.append(cpu_freq)
 
             if len(measurements) == 0:
                 raise Exception(
                     "No measurements were taken\n Function probably ran too fast or was interrupted.")
 
+            if freq_reader is not None:
+                freq_reader.close()
+                wattages = self.model.predict_batch(cpu_utils, sample_freqs)
+                measurements = [(x[0], float(wattage))
+                                for x, wattage in zip(measurements, wattages)]
+
             total_time = time.time_ns() - start
             total_time_ms = math.ceil(total_time / 1_000_000)
 
@@ -80,12 +99,23 @@ class MeasureProcess(Process):
             avg_wattage = float(np.mean(
                 list(wattages)))
             avg_temp = float(np.mean(
-                list(cpu_temps)))
+                list(cpu_temps))) if cpu_temps else None
+            avg_freq = float(np.mean(
+                list(cpu_freqs))) if cpu_freqs else None
             avg_cpu_util = float(np.mean(
                 list(cpu_utils)))
 
+            # utilization trace, so the energy can be recomputed offline
+            trace = {
+                "time": [round((x[0] - start) / 1_000_000, 3) for x in measurements],
+                "utilization": cpu_utils,
+            }
+
+            # CPU time of the measuring process itself in s, for overhead benchmarks
+            cpu_time = time.process_time()
+
             self.connection.send(
-                (total_time_ms, energy, avg_wattage, avg_temp, avg_cpu_util))
+                (total_time_ms, energy, avg_wattage, avg_temp, avg_cpu_util, trace, avg_freq, cpu_time))
         except Exception as e:
             self.connection.send(e)
 
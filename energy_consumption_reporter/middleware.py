@@ -0,0 +1,301 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Optional
+
+import numpy as np
+import psutil
+
+from energy_consumption_reporter.sampler import Sampler, Window
+
+logger = logging.getLogger(__name__)
+
+OTHER_ROUTE = "<other>"
+
+
+class _Request:
+    __slots__ = ("route", "thread_id", "start", "end", "cpu_start", "cpu_end", "energy")
+
+    def __init__(self, route: str, thread_id: int, start: int, cpu_start: float):
+        self.route = route
+        self.thread_id = thread_id
+        self.start = start
+        self.end: Optional[int] = None
+        self.cpu_start = cpu_start
+        self.cpu_end: Optional[float] = None
+        self.energy = 0.0
+
+
+class RouteStats:
+    """Running totals and a bounded sample of per-request values for one route.
+
+    Keyword arguments:
+    max_samples -- number of most recent requests kept for the percentiles
+    """
+
+    def __init__(self, max_samples: int = 10_000):
+        self.count = 0
+        self.total_energy = 0.0
+        self.total_time = 0.0
+        self.energies: deque[float] = deque(maxlen=max_samples)
+        self.times: deque[float] = deque(maxlen=max_samples)
+
+    def add(self, energy: float, duration_ms: float):
+        self.count += 1
+        self.total_energy += energy
+        self.total_time += duration_ms
+        self.energies.append(energy)
+        self.times.append(duration_ms)
+
+    def summary(self, percentiles=(50, 90, 99)) -> dict[str, Any]:
+        energies = np.fromiter(self.energies, dtype=float)
+        times = np.fromiter(self.times, dtype=float)
+        summary = {
+            "N": self.count,
+            "total_energy": self.total_energy,
+            "avg_energy": self.total_energy / self.count if self.count else 0.0,
+            "avg_execution_time": self.total_time / self.count if self.count else 0.0,
+        }
+        if len(energies) > 0:
+            for p, e, t in zip(percentiles,
+                               np.percentile(energies, percentiles),
+                               np.percentile(times, percentiles)):
+                summary[f"p{p}_energy"] = float(e)
+                summary[f"p{p}_execution_time"] = float(t)
+        return summary
+
+
+class EnergyAttributor:
+    """Attributes the energy of an always-on sampler to in-flight requests.
+
+    Each sampling window's energy is split over the requests that were active
+    in it, weighted by the CPU time their thread spent in that window. The
+    thread CPU clock is also read when a request begins and ends, so threads
+    that exit before the window closes (thread-per-request servers) are still
+    accounted for. When several requests share a thread (e.g. an asyncio event
+    loop) the thread's CPU time is divided by their overlap with the window.
+    CPU time of threads that served no request is kept as unattributed energy.
+
+    begin() and end() only take a lock and touch a dict, so the overhead per
+    request is constant; all the bookkeeping happens on the sampler thread.
+
+    Keyword arguments:
+    model -- object with a predict(utilization) method (default: EnergyModel)
+    interval -- length of a sampling window in seconds
+    max_samples -- number of recent requests per route kept for percentiles
+    max_routes -- routes beyond this amount are aggregated under OTHER_ROUTE
+    """
+
+    def __init__(self, model=None, interval: float = 0.2, max_samples: int = 10_000, max_routes: int = 1000):
+        if model is None:
+            from energy_consumption_reporter.energy_model import EnergyModel
+            model = EnergyModel()
+
+        self.max_samples = max_samples
+        self.max_routes = max_routes
+        self.lock = threading.Lock()
+        self.active: dict[int, _Request] = {}
+        self.finished: list[_Request] = []
+        self.routes: dict[str, RouteStats] = {}
+        self.unattributed_energy = 0.0
+        self.process = psutil.Process()
+        self.thread_times: dict[int, float] = {}
+
+        self.sampler = Sampler(model, interval, self.process)
+        self.sampler.add_listener(self.on_window)
+
+    def start(self):
+        if self.sampler.is_alive():
+            return
+        self.thread_times = self._thread_times()
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.terminate()
+        self.sampler.join()
+
+    def begin(self, route: str) -> _Request:
+        request = _Request(route, threading.get_native_id(),
+                           time.time_ns(), time.thread_time())
+        with self.lock:
+            self.active[id(request)] = request
+        return request
+
+    def end(self, request: _Request):
+        cpu_end = time.thread_time()
+        end = time.time_ns()
+        # a request is finished exactly when it moves to self.finished, so
+        # on_window never sees it as both finished and still active
+        with self.lock:
+            if request.end is not None:
+                return
+            request.cpu_end = cpu_end
+            request.end = end
+            self.active.pop(id(request), None)
+            self.finished.append(request)
+
+    def on_window(self, window: Window):
+        # end and cpu_end are copied at the snapshot, so a request that ends
+        # while this window is processed is only counted in the next one
+        with self.lock:
+            snapshot = [(request, None, None) for request in self.active.values()] + \
+                [(request, request.end, request.cpu_end) for request in self.finished]
+            self.finished = []
+
+        # CPU clock of every thread now and at the start of the window, falling
+        # back to the values recorded by the requests for threads we never saw
+        thread_times = self._thread_times()
+        now = dict(thread_times)
+        before = dict(self.thread_times)
+        for request, _, cpu_end in snapshot:
+            tid = request.thread_id
+            if cpu_end is not None and tid not in thread_times:
+                now[tid] = max(now.get(tid, 0.0), cpu_end)
+            if tid not in self.thread_times:
+                before[tid] = min(before.get(tid, request.cpu_start), request.cpu_start)
+        cpu_deltas = {tid: max(cpu - before.get(tid, 0.0), 0.0)
+                      for tid, cpu in now.items()}
+        self.thread_times = thread_times
+        total_cpu = sum(cpu_deltas.values())
+
+        # wall-clock overlap of every request with this window, per thread
+        overlaps = []
+        thread_overlap: dict[int, int] = {}
+        for request, request_end, _ in snapshot:
+            end = window.end if request_end is None else min(request_end, window.end)
+            overlap = max(end - max(request.start, window.start), 0)
+            overlaps.append(overlap)
+            if overlap > 0:
+                thread_overlap[request.thread_id] = thread_overlap.get(
+                    request.thread_id, 0) + overlap
+
+        attributed = 0.0
+        pending = []
+        for (request, request_end, _), overlap in zip(snapshot, overlaps):
+            if overlap > 0 and total_cpu > 0:
+                cpu = cpu_deltas.get(request.thread_id, 0.0) * \
+                    overlap / thread_overlap[request.thread_id]
+                energy = window.energy * cpu / total_cpu
+                request.energy += energy
+                attributed += energy
+
+            if request_end is None:
+                continue
+            if request_end > window.end:
+                # finished after this window closed, the next window completes it
+                pending.append(request)
+            else:
+                self._route_stats(request.route).add(
+                    request.energy, (request_end - request.start) / 1_000_000)
+
+        self.unattributed_energy += window.energy - attributed
+        if pending:
+            # remember how far exited threads were accounted for this window
+            for request in pending:
+                if request.thread_id not in self.thread_times:
+                    self.thread_times[request.thread_id] = now[request.thread_id]
+            with self.lock:
+                self.finished.extend(pending)
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        return {route: stats.summary() for route, stats in sorted(self.routes.items())}
+
+    def _route_stats(self, route: str) -> RouteStats:
+        stats = self.routes.get(route)
+        if stats is None:
+            if len(self.routes) >= self.max_routes:
+                route = OTHER_ROUTE
+                stats = self.routes.get(route)
+            if stats is None:
+                stats = RouteStats(self.max_samples)
+                self.routes[route] = stats
+        return stats
+
+    def _thread_times(self) -> dict[int, float]:
+        try:
+            return {t.id: t.user_time + t.system_time for t in self.process.threads()}
+        except psutil.Error as err:
+            logger.debug("Could not read thread CPU times: %s", err)
+            return {}
+
+
+def _wsgi_route(environ) -> str:
+    return f"{environ.get('REQUEST_METHOD', 'GET')} {environ.get('PATH_INFO') or '/'}"
+
+
+def _asgi_route(scope) -> str:
+    return f"{scope.get('method', 'GET')} {scope.get('path') or '/'}"
+
+
+class _ClosingIterable:
+    """Response iterable that ends the request when the server closes it."""
+
+    def __init__(self, iterable, on_close: Callable[[], None]):
+        self.iterable = iterable
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.iterable)
+
+    def close(self):
+        try:
+            if hasattr(self.iterable, "close"):
+                self.iterable.close()
+        finally:
+            self.on_close()
+
+
+class EnergyMiddleware:
+    """WSGI middleware that attributes energy to every request it serves.
+
+    Keyword arguments:
+    app -- the WSGI application to wrap
+    attributor -- shared EnergyAttributor (default: a new one with EnergyModel)
+    route -- function mapping the WSGI environ to a route name
+    """
+
+    def __init__(self, app, attributor: Optional[EnergyAttributor] = None, route: Optional[Callable[[dict], str]] = None):
+        self.app = app
+        self.attributor = attributor or EnergyAttributor()
+        self.route = route or _wsgi_route
+        self.attributor.start()
+
+    def __call__(self, environ, start_response):
+        request = self.attributor.begin(self.route(environ))
+        try:
+            result = self.app(environ, start_response)
+        except BaseException:
+            self.attributor.end(request)
+            raise
+        return _ClosingIterable(result, lambda: self.attributor.end(request))
+
+
+class ASGIEnergyMiddleware:
+    """ASGI middleware that attributes energy to every HTTP request it serves.
+
+    Requests handled by the same event loop share its thread's CPU time in
+    proportion to how long they were in flight during a sampling window.
+
+    Keyword arguments:
+    app -- the ASGI application to wrap
+    attributor -- shared EnergyAttributor (default: a new one with EnergyModel)
+    route -- function mapping the ASGI scope to a route name
+    """
+
+    def __init__(self, app, attributor: Optional[EnergyAttributor] = None, route: Optional[Callable[[dict], str]] = None):
+        self.app = app
+        self.attributor = attributor or EnergyAttributor()
+        self.route = route or _asgi_route
+        self.attributor.start()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request = self.attributor.begin(self.route(scope))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.attributor.end(request)
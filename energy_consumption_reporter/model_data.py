@@ -0,0 +1,49 @@
+import logging
+import os
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+file_dir = os.path.join(os.path.dirname(os.path.realpath(__file__)))
+model_path = os.path.join(file_dir, 'model.pkl')
+data_path = os.path.join(file_dir, 'data/spec_data_cleaned.csv')
+
+
+def feature_row(cpu_info) -> pd.DataFrame:
+    """Returns the model input for this machine at 0% utilization."""
+    Z = pd.DataFrame.from_dict({
+        'HW_CPUFreq': [cpu_info.freq],
+        'CPUThreads': [cpu_info.threads],
+        'CPUCores': [cpu_info.cores],
+        'TDP': [cpu_info.tdp or 100],
+        'HW_MemAmountGB': [cpu_info.mem],
+        'Architecture': [cpu_info.architecture],
+        'CPUMake': [cpu_info.make],
+        'utilization': [0.0]
+    })
+
+    Z = pd.get_dummies(Z, columns=['CPUMake', 'Architecture'])
+    return Z.dropna(axis=1)
+
+
+def load_training_data(columns, cpu_chips=None, path=data_path):
+    """Returns the SPEC training data restricted to columns and the amount of chips."""
+    df = pd.read_csv(path)
+
+    X = df.copy()
+    X = pd.get_dummies(X, columns=['CPUMake', 'Architecture'])
+
+    if cpu_chips:
+        logger.info(
+            'Training data will be restricted to the following amount of chips: %d', cpu_chips)
+
+        X = X[X.CPUChips == cpu_chips]
+
+    if X.empty:
+        raise RuntimeError(
+            f"The training data does not contain any servers with a chips amount ({cpu_chips}). Please select a different amount.")
+
+    y = X.power
+
+    X = X[columns]
+    return X, y
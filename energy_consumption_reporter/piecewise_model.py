@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+
+
+class PiecewiseLinearModel:
+    """Interpolates the power between the measured utilizations of a hardware configuration.
+
+    Every distinct combination of the non-utilization columns gets its own
+    utilization to power curve. Rows of an unknown configuration use the
+    curve of the nearest known configuration (standardized distance).
+    """
+
+    def fit(self, X: pd.DataFrame, y):
+        self.config_columns = [c for c in X.columns if c != 'utilization']
+        configs = X[self.config_columns].to_numpy(dtype=float)
+        utilizations = X['utilization'].to_numpy(dtype=float)
+        power = np.asarray(y, dtype=float)
+
+        self.configs, inverse = np.unique(
+            configs, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        self.scale = configs.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+
+        self.curves = []
+        for i in range(len(self.configs)):
+            mask = inverse == i
+            # average the power of duplicate utilizations
+            points, point_index = np.unique(
+                utilizations[mask], return_inverse=True)
+            point_index = point_index.reshape(-1)
+            means = np.bincount(point_index, weights=power[mask]) / \
+                np.bincount(point_index)
+            self.curves.append((points, means))
+        return self
+
+    def predict(self, X: pd.DataFrame) -> np.ndarray:
+        configs = X[self.config_columns].to_numpy(dtype=float)
+        utilizations = X['utilization'].to_numpy(dtype=float)
+
+        # the nearest configuration is looked up once per distinct configuration
+        unique_configs, inverse = np.unique(
+            configs, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        distances = (((unique_configs[:, None, :] - self.configs[None, :, :]) /
+                      self.scale) ** 2).sum(axis=2)
+        nearest = distances.argmin(axis=1)
+
+        predictions = np.empty(len(X), dtype=float)
+        for i, config in enumerate(nearest):
+            mask = inverse == i
+            points, means = self.curves[config]
+            predictions[mask] = np.interp(utilizations[mask], points, means)
+        return predictions
@@ -0,0 +1,126 @@
+import os
+import sys
+import threading
+import time
+from typing import Any, Optional
+
+from energy_consumption_reporter.sampler import PowerSampler
+
+
+class EnergyProfiler(threading.Thread):
+    """Sampling profiler that attributes energy to the call stacks of a thread.
+
+    Every interval seconds the stack of the measured thread is captured with
+    sys._current_frames(). Every window seconds the energy of the process in
+    that window is split over the stacks captured in it, proportional to how
+    often each stack was seen. The overhead is bounded by the sampling
+    interval and the maximum stack depth.
+
+    Keyword arguments:
+    model -- object with a predict(utilization) method returning Watts
+    thread_ident -- threading ident of the thread to profile (default: the caller)
+    interval -- time between two stack samples in seconds
+    window -- length of an energy window in seconds
+    max_depth -- amount of innermost frames kept per stack
+    """
+
+    def __init__(self, model, thread_ident: Optional[int] = None, interval: float = 0.01, window: float = 0.2, max_depth: int = 64):
+        super().__init__(name="energy-profiler", daemon=True)
+        self.model = model
+        self.thread_ident = thread_ident or threading.get_ident()
+        self.interval = interval
+        self.window = window
+        self.max_depth = max_depth
+        self.exit = threading.Event()
+
+        self.stacks: dict[tuple[str, ...], float] = {}
+        self.energy = 0.0
+        self.samples = 0
+        self.windows = 0
+        self.utilizations: list[float] = []
+        self.overhead = 0.0  # CPU time of the profiler thread in s
+        self.labels: dict[Any, str] = {}
+
+    def _label(self, code) -> str:
+        label = self.labels.get(code)
+        if label is None:
+            # ";" separates the frames in the collapsed stack format
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(
+                ";", ":")
+            self.labels[code] = label
+        return label
+
+    def _stack(self, frame) -> tuple[str, ...]:
+        frames = []
+        while frame is not None and len(frames) < self.max_depth:
+            frames.append(self._label(frame.f_code))
+            frame = frame.f_back
+        return tuple(reversed(frames))
+
+    def _close_window(self, power_sampler: PowerSampler, window_stacks: dict[tuple[str, ...], int]):
+        window = power_sampler.sample()
+        self.energy += window.energy
+        self.windows += 1
+        self.utilizations.append(window.utilization)
+
+        total = sum(window_stacks.values())
+        for stack, count in window_stacks.items():
+            self.stacks[stack] = self.stacks.get(
+                stack, 0.0) + window.energy * count / total
+
+    def run(self):
+        power_sampler = PowerSampler(self.model)
+        window_stacks: dict[tuple[str, ...], int] = {}
+        next_window = time.monotonic() + self.window
+
+        while not self.exit.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_ident)
+            if frame is not None:
+                stack = self._stack(frame)
+                window_stacks[stack] = window_stacks.get(stack, 0) + 1
+                self.samples += 1
+            del frame
+
+            if time.monotonic() >= next_window:
+                self._close_window(power_sampler, window_stacks)
+                window_stacks = {}
+                next_window += self.window
+
+        self._close_window(power_sampler, window_stacks)
+        self.overhead = time.thread_time()
+
+    def terminate(self):
+        self.exit.set()
+
+    def collapsed(self) -> list[str]:
+        """Returns the stacks in the collapsed format used by flamegraph tools.
+
+        The values are in microjoules, since these tools expect integers.
+        """
+        return [f"{';'.join(stack)} {round(energy * 1_000_000)}"
+                for stack, energy in sorted(self.stacks.items()) if round(energy * 1_000_000) > 0]
+
+    def write_collapsed(self, file_path: str):
+        with open(file_path, 'w+') as file:
+            file.write("\n".join(self.collapsed()) + "\n")
+
+    def top(self, n: int = 10) -> list[dict[str, Any]]:
+        """Returns the n functions with the most energy spent in the function itself."""
+        self_energy: dict[str, float] = {}
+        total_energy: dict[str, float] = {}
+        for stack, energy in self.stacks.items():
+            if len(stack) == 0:
+                continue
+            self_energy[stack[-1]] = self_energy.get(stack[-1], 0.0) + energy
+            # recursive functions only count once per stack
+            for function in set(stack):
+                total_energy[function] = total_energy.get(
+                    function, 0.0) + energy
+
+        top = sorted(self_energy.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [{
+            "function": function,
+            "self_energy": energy,
+            "total_energy": total_energy[function],
+            "self_percentage": energy / self.energy * 100 if self.energy else 0.0,
+        } for function, energy in top]
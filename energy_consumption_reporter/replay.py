@@ -0,0 +1,184 @@
+import argparse
+import copy
+import csv
+import importlib
+import json
+import logging
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "energy_consumption_reporter.energy_model:EnergyModel"
+
+# model instance of a worker process, created once by _init_worker
+_model = None
+
+
+def load_model(model_path: str, zero_offset: bool = False):
+    """Imports and instantiates a model given as "package.module:ClassName"."""
+    module_name, _, class_name = model_path.partition(":")
+    model_cls = getattr(importlib.import_module(module_name), class_name)
+    model = model_cls()
+    if hasattr(model, "set_zero_offset"):
+        model.set_zero_offset(zero_offset)
+    return model
+
+
+def predict_batch(model, utilizations: np.ndarray) -> np.ndarray:
+    """Predicts all utilizations at once, falling back to predict() per value."""
+    if len(utilizations) == 0:
+        return np.array([], dtype=float)
+    if hasattr(model, "predict_batch"):
+        return np.asarray(model.predict_batch(utilizations), dtype=float)
+    return np.array([model.predict(float(u)) for u in utilizations], dtype=float)
+
+
+def load_trace_csv(file_path: str) -> dict[str, Any]:
+    """Converts a trace CSV file into a report with traces but without energy.
+
+    The CSV file must have the columns name, iteration, time (ms since the
+    start of the iteration) and utilization (%).
+    """
+    cases: dict[str, dict[int, dict[str, list[float]]]] = {}
+    with open(file_path, newline="") as file:
+        for row in csv.DictReader(file):
+            iterations = cases.setdefault(row["name"], {})
+            trace = iterations.setdefault(
+                int(row["iteration"]), {"time": [], "utilization": []})
+            trace["time"].append(float(row["time"]))
+            trace["utilization"].append(float(row["utilization"]))
+
+    report_cases = []
+    for name, iterations in cases.items():
+        traces = [iterations[i] for i in sorted(iterations)]
+        report_cases.append({
+            "name": name,
+            "result": "pass",
+            "reason": "",
+            "N": len(traces),
+            "execution_time": [math.ceil(trace["time"][-1]) for trace in traces],
+            "trace": traces,
+        })
+    return {"results": {"name": os.path.basename(file_path), "cases": report_cases}}
+
+
+def rescore_report(report: dict[str, Any], model, model_name: Optional[str] = None) -> dict[str, Any]:
+    """Returns a copy of report with energy and power recomputed by model.
+
+    The utilization traces of all cases are predicted in one vectorized batch.
+    Cases without a trace are kept as they are. The baseline was measured
+    with the original model, so net_energy is removed from the rescored
+    cases and the baseline is kept as original_baseline.
+    """
+    report = copy.deepcopy(report)
+    results = report["results"]
+
+    traces = [(case, trace) for case in results.get("cases", [])
+              for trace in case.get("trace", [])]
+    utilizations = np.concatenate(
+        [np.asarray(trace["utilization"], dtype=float) for _, trace in traces]) \
+        if traces else np.array([], dtype=float)
+    wattages = predict_batch(model, utilizations)
+    splits = np.cumsum([len(trace["utilization"]) for _, trace in traces])[:-1]
+
+    rescored: dict[int, tuple[list[float], list[float]]] = {}
+    for (case, trace), trace_wattages in zip(traces, np.split(wattages, splits)):
+        energy_list, power_list = rescored.setdefault(id(case), ([], []))
+        times = np.asarray(trace["time"], dtype=float) / 1000
+        energy_list.append(float(np.trapz(trace_wattages, times)))
+        power_list.append(float(np.mean(trace_wattages))
+                          if len(trace_wattages) else 0.0)
+
+    skipped = 0
+    for case in results.get("cases", []):
+        if id(case) not in rescored:
+            skipped += 1
+            continue
+        energy_list, power_list = rescored[id(case)]
+        case["energy"] = [int(item*10000) / 10000 for item in energy_list]
+        case["power"] = [int(item*10000) / 10000 for item in power_list]
+        case.pop("net_energy", None)
+    if skipped:
+        logger.warning(
+            "%d case(s) of report %s have no trace and were not rescored", skipped, results.get("name"))
+
+    if model_name is None:
+        model_name = type(model).__name__
+    if "baseline" in results:
+        results["original_baseline"] = results.pop("baseline")
+    if "model" in results:
+        results["original_model"] = results["model"]
+    results["model"] = model_name
+    return report
+
+
+def _init_worker(model_path: str, zero_offset: bool):
+    global _model
+    _model = load_model(model_path, zero_offset)
+
+
+def _rescore_file(file_path: str, output_dir: str, model_name: str) -> str:
+    if file_path.endswith(".csv"):
+        report = load_trace_csv(file_path)
+    else:
+        with open(file_path) as file:
+            report = json.load(file)
+
+    report = rescore_report(report, _model, model_name)
+
+    name = os.path.splitext(os.path.basename(file_path))[0] + ".json"
+    output_path = os.path.join(output_dir, name)
+    with open(output_path, 'w+') as file:
+        file.write(json.dumps(report, indent=4))
+    return output_path
+
+
+def replay(file_paths: list[str], output_dir: str, model_path: str = DEFAULT_MODEL, zero_offset: bool = False, processes: Optional[int] = None) -> list[str]:
+    """Rescores report or trace files with another model in a process pool.
+
+    Every worker process instantiates the model once and then handles a
+    share of the files. Returns the paths of the written reports.
+
+    Keyword arguments:
+    file_paths -- report (.json) or trace (.csv) files to rescore
+    output_dir -- directory to write the rescored reports to
+    model_path -- model to use, given as "package.module:ClassName"
+    zero_offset -- whether to subtract the model's prediction at 0% utilization
+    processes -- amount of worker processes (default: amount of CPUs)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    model_name = model_path.partition(":")[2]
+    with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                             initargs=(model_path, zero_offset)) as pool:
+        return list(pool.map(_rescore_file, file_paths,
+                             [output_dir] * len(file_paths),
+                             [model_name] * len(file_paths)))
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ReporterReplay",
+        description="Recomputes the energy of recorded utilization traces with another model.",
+    )
+    parser.add_argument("files", nargs="+",
+                        help="reports (.json) recorded with traces or trace files (.csv)")
+    parser.add_argument("-o", "--output-dir", default="rescored",
+                        help="directory to write the rescored reports to")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL,
+                        help="model to use, given as package.module:ClassName")
+    parser.add_argument("--zero-offset", action="store_true",
+                        help="subtract the model's prediction at 0%% utilization")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="amount of worker processes")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _parser().parse_args()
+    for path in replay(args.files, args.output_dir, args.model, args.zero_offset, args.processes):
+        print(path)
@@ -1,8 +1,8 @@
 import datetime
 import json
 import os
-import re
 import subprocess
+import uuid
 import psutil
 
 
@@ -15,6 +15,10 @@ class ReportBuilder:
         self.time = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
         self.version = 0
         self.report = {"results": {}}
+        self.baseline = None
+        self.run_id = uuid.uuid4().hex
+        self.aggregator = None
+        self.seq = 0
 
     def set_name(self, name: str):
         self.name = name
@@ -28,6 +32,16 @@ class ReportBuilder:
         self.description = description
         self.report["results"].update({"description": self.description})
 
+    def set_baseline(self, baseline):
+        self.baseline = baseline
+        self.report["results"].update({"baseline": baseline.to_dict()})
+
+    def set_aggregator(self, aggregator):
+        """Streams every case to an AggregatorClient as well."""
+        self.aggregator = aggregator
+        import atexit
+        atexit.register(aggregator.close)
+
     def generate_report(self):
         self.version += 1
 
@@ -43,8 +57,8 @@ class ReportBuilder:
         self.report["results"].update({"commit": commit})
         self.report["results"].update({"date": self.time})
         self.report["results"].update({"model": self.model_name})
+        self.report["results"].update({"run_id": self.run_id})
 
-        cpu_name = "Unknown CPU"
         temp = -1
         try:
             if psutil.WINDOWS:
@@ -53,35 +67,34 @@ class ReportBuilder:
                 thermal_zone_info = c.query(
                     "SELECT * FROM Win32_PerfFormattedData_Counters_ThermalZoneInformation WHERE Name LIKE '%CPU%'")
                 temp = int(thermal_zone_info[0].Temperature - 273.15)
-
-                cpu_name = c.Win32_Processor(
-                )[0].Name if c.Win32_Processor() else "Unknown CPU"
             else:
                 sensor_data = json.loads(subprocess.check_output(
                     ["sensors", "-j"]).decode("utf-8"))
                 temp = int(sensor_data.get(
                     "k10temp-pci-00c3").get("Tctl").get("temp1_input"))
-                cpuinfo = subprocess.check_output('lscpu', encoding='UTF-8')
-                match = re.search(r'Model name:\s*(.*)', cpuinfo)
-                cpu_name = str(match.group(1) if match else "Unknown CPU")
         except:
             pass
 
+        # read separately, most machines have no temperature sensor we know of
+        from energy_consumption_reporter.auto_detect import get_cpu_name
+        cpu_name = get_cpu_name() or "Unknown CPU"
+
         pc_name = subprocess.check_output(
             'hostname', encoding='UTF-8').removesuffix("\n")
 
         hardware = {
             "PC_name": pc_name,
-            "CPU_name": cpu_name if cpu_name else "Unknown CPU",
+            "CPU_name": cpu_name,
             "CPU_temp": temp if temp else -1,
-            "CPU_freq": psutil.cpu_freq().max,
+            # virtual machines often report no maximum frequency
+            "CPU_freq": psutil.cpu_freq().max or psutil.cpu_freq().current,
         }
 
         self.report["results"].update({"hardware": hardware})
 
         self.report["results"].update({"cases": []})
 
-    def add_case(self, time_list, energy_list, power_list, avg_cpu_util, test_name, passed, reason):
+    def add_case(self, time_list, energy_list, power_list, avg_cpu_util, test_name, passed, reason, trace_list=None, extra=None):
         energy_list = [
             int(item*10000) / 10000 for item in energy_list]
 
@@ -100,9 +113,30 @@ class ReportBuilder:
             "energy": energy_list,
             "power": power_list,
         }
+        if self.baseline is not None:
+            case["net_energy"] = [int((energy - self.baseline.energy(time))*10000) / 10000
+                                  for time, energy in zip(time_list, energy_list)]
+        if trace_list is not None:
+            case["trace"] = trace_list
+        if extra is not None:
+            case.update(extra)
 
         self.report["results"]["cases"].append(case)
 
+        if self.aggregator is not None:
+            self.seq += 1
+            self.aggregator.send({
+                "run_id": self.run_id,
+                "seq": self.seq,
+                "model": self.model_name,
+                "hardware": self.report["results"].get("hardware", {}),
+                # traces are too large to stream and not used by the aggregator
+                "case": {key: value for key, value in case.items() if key != "trace"},
+            })
+
+    def add_comparison(self, comparison):
+        self.report["results"].setdefault("comparisons", []).append(comparison)
+
     def save_report(self, file_path=None):
         if file_path is None:
             file_dir = os.path.join(os.getcwd(), self.report_path)
@@ -0,0 +1,81 @@
+import threading
+import time
+from typing import Callable, NamedTuple, Optional
+
+import psutil
+
+from energy_consumption_reporter.cgroup import cpu_count
+
+
+class Window(NamedTuple):
+    start: int  # in ns
+    end: int  # in ns
+    utilization: float  # in %
+    wattage: float  # in W
+    energy: float  # in J
+
+
+class PowerSampler:
+    """Converts the CPU utilization of a process into consecutive energy windows.
+
+    Every call to sample() closes the window that started at the previous
+    call, so the windows returned are contiguous and cover the full time the
+    sampler has been running.
+
+    Keyword arguments:
+    model -- object with a predict(utilization) method returning Watts
+    process -- psutil.Process to measure (default: the current process)
+    """
+
+    def __init__(self, model, process: Optional[psutil.Process] = None):
+        self.model = model
+        self.process = process or psutil.Process()
+        self.cpu_count = cpu_count()
+        # the first call to cpu_percent always returns 0.0, so prime it here
+        self.process.cpu_percent(interval=None)
+        self.last_time = time.time_ns()
+
+    def sample(self) -> Window:
+        now = time.time_ns()
+        utilization = self.process.cpu_percent(interval=None) / self.cpu_count
+        utilization = min(max(utilization, 0.0), 100.0)
+        wattage = float(self.model.predict(float(utilization)))
+
+        start = self.last_time
+        self.last_time = now
+        energy = wattage * (now - start) / 1_000_000_000
+        return Window(start, now, utilization, wattage, energy)
+
+
+class Sampler(threading.Thread):
+    """Always-on sampler thread that hands every energy window to its listeners.
+
+    Unlike MeasureProcess this runs inside the measured process, which makes
+    it suitable for long-running programs such as web servers.
+
+    Keyword arguments:
+    model -- object with a predict(utilization) method returning Watts
+    interval -- length of a sampling window in seconds
+    process -- psutil.Process to measure (default: the current process)
+    """
+
+    def __init__(self, model, interval: float = 0.2, process: Optional[psutil.Process] = None):
+        super().__init__(name="energy-sampler", daemon=True)
+        self.model = model
+        self.interval = interval
+        self.process = process
+        self.exit = threading.Event()
+        self.listeners: list[Callable[[Window], None]] = []
+
+    def add_listener(self, listener: Callable[[Window], None]):
+        self.listeners.append(listener)
+
+    def run(self):
+        power_sampler = PowerSampler(self.model, self.process)
+        while not self.exit.wait(self.interval):
+            window = power_sampler.sample()
+            for listener in self.listeners:
+                listener(window)
+
+    def terminate(self):
+        self.exit.set()
@@ -0,0 +1,117 @@
+import json
+import logging
+import subprocess
+import time
+from typing import Optional
+try:
+    import wmi  # type: ignore
+except ImportError:
+    pass
+import psutil
+
+logger = logging.getLogger(__name__)
+
+
+def read_cpu_temperature() -> Optional[int]:
+    """Returns the current CPU temperature in degrees Celsius, or None if unknown."""
+    try:
+        if psutil.WINDOWS:
+            c = wmi.WMI()
+            thermal_zone_info = c.query(
+                "SELECT * FROM Win32_PerfFormattedData_Counters_ThermalZoneInformation WHERE Name LIKE '%CPU%'")
+            if len(thermal_zone_info) > 0:
+                return int(thermal_zone_info[0].Temperature - 273.15)
+            return None
+
+        sensor_data = json.loads(subprocess.check_output(
+            ["sensors", "-j"], stderr=subprocess.DEVNULL).decode("utf-8"))
+        return int(sensor_data.get(
+            "k10temp-pci-00c3").get("Tctl").get("temp1_input"))
+    except:
+        pass
+
+    # fall back to the sensors psutil knows about
+    try:
+        sensors = psutil.sensors_temperatures()
+        for name in ("coretemp", "k10temp", "zenpower", "cpu_thermal", "acpitz"):
+            if sensors.get(name):
+                return int(max(sensor.current for sensor in sensors[name]))
+    except (AttributeError, OSError):
+        pass
+    return None
+
+
+def read_cpu_frequency() -> Optional[float]:
+    """Returns the current CPU frequency in MHz, or None if unknown."""
+    try:
+        freq = psutil.cpu_freq()
+    except (NotImplementedError, OSError):
+        return None
+    if freq is None or not freq.current:
+        return None
+    return float(freq.current)
+
+
+class ThermalScheduler:
+    """Waits between iterations until the CPU is back at its baseline temperature.
+
+    The baseline temperature is read by calibrate(), which should be called
+    on an idle machine; set_thermal_scheduler() calls it when the scheduler
+    is set. Before every iteration wait() blocks until the temperature is at
+    most temp_band degrees above the baseline, or until timeout. The
+    frequency is not waited for, since an idle CPU with frequency scaling
+    may stay at a low clock. Instead, throttled() flags the iterations of a
+    case that ran more than freq_band (fraction) below its fastest iteration.
+
+    Keyword arguments:
+    temp_band -- allowed temperature rise over the baseline in degrees Celsius
+    freq_band -- allowed relative frequency drop below the fastest iteration
+    timeout -- maximum time to wait before an iteration in seconds
+    poll -- time between two readings while waiting in seconds
+    """
+
+    def __init__(self, temp_band: float = 5.0, freq_band: float = 0.1, timeout: float = 30.0, poll: float = 0.5):
+        self.temp_band = temp_band
+        self.freq_band = freq_band
+        self.timeout = timeout
+        self.poll = poll
+        self.base_temp: Optional[float] = None
+        self.is_calibrated = False
+
+    def calibrate(self):
+        self.base_temp = read_cpu_temperature()
+        self.is_calibrated = True
+        logger.info('Thermal baseline: %s C', self.base_temp)
+
+    def in_band(self, temp: Optional[float]) -> bool:
+        return temp is None or self.base_temp is None or temp <= self.base_temp + self.temp_band
+
+    def throttled(self, freqs: list[Optional[float]]) -> list[bool]:
+        """Returns for every iteration of a case whether it ran throttled.
+
+        Under load the frequency differs from the idle frequency, so every
+        iteration is compared to the fastest iteration of the case. Since this
+        needs all iterations, it is computed after the last one.
+        """
+        known = [freq for freq in freqs if freq is not None]
+        if not known:
+            return [False] * len(freqs)
+        reference = max(known)
+        return [freq is not None and freq < reference * (1 - self.freq_band) for freq in freqs]
+
+    def wait(self) -> float:
+        """Waits until the CPU is back in the baseline band and returns the time waited in s."""
+        if not self.is_calibrated:
+            logger.warning(
+                'Thermal scheduler was not calibrated on an idle machine, calibrating now')
+            self.calibrate()
+            return 0.0
+
+        start = time.monotonic()
+        while not self.in_band(read_cpu_temperature()):
+            if time.monotonic() - start >= self.timeout:
+                logger.warning(
+                    'CPU did not return to its thermal baseline within %.1f s', self.timeout)
+                break
+            time.sleep(self.poll)
+        return time.monotonic() - start
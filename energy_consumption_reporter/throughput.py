@@ -0,0 +1,82 @@
+import math
+import statistics
+import time
+from typing import Any, Callable, Optional
+
+
+def _noop():
+    pass
+
+
+def run_loop(func: Callable, loops: int) -> float:
+    """Calls func loops times and returns the elapsed time in s."""
+    start = time.perf_counter()
+    for _ in range(loops):
+        func()
+    return time.perf_counter() - start
+
+
+def autorange(func: Callable, min_time: float) -> int:
+    """Returns the amount of loops of func that takes at least min_time seconds.
+
+    Like timeit.Timer.autorange the amount of loops is increased in the
+    sequence 1, 2, 5, 10, 20, 50, ... until the loop is long enough.
+    """
+    i = 1
+    while True:
+        for j in 1, 2, 5:
+            loops = i * j
+            if run_loop(func, loops) >= min_time:
+                return loops
+        i *= 10
+
+
+def empty_loop_loops(loops: int, min_time: float) -> int:
+    """Returns a multiple of loops for which the empty loop takes at least min_time."""
+    elapsed = run_loop(_noop, loops)
+    return loops * max(math.ceil(min_time / max(elapsed, 1e-9)), 1)
+
+
+def dispersion(values: list[Optional[float]]) -> dict[str, Any]:
+    """Returns the values with their mean, standard deviation, minimum and maximum."""
+    present = [v for v in values if v is not None]
+    return {
+        "values": values,
+        "mean": statistics.fmean(present) if present else None,
+        "stdev": statistics.stdev(present) if len(present) > 1 else 0.0,
+        "min": min(present) if present else None,
+        "max": max(present) if present else None,
+    }
+
+
+def summarize(loops: int, time_list: list[float], energy_list: list[float], empty_time: float, empty_energy: float) -> dict[str, Any]:
+    """Computes the per-operation figures of every measured loop.
+
+    The time (ms) and energy (J) of an empty loop per operation are
+    subtracted first, so only the cost of the work itself remains.
+
+    Keyword arguments:
+    loops -- amount of operations in every measured loop
+    time_list -- execution time of every measured loop in ms
+    energy_list -- energy of every measured loop in J
+    empty_time -- time of a single empty loop operation in ms
+    empty_energy -- energy of a single empty loop operation in J
+    """
+    energy_per_op = []
+    ops_per_s = []
+    ops_per_j = []
+    for loop_time, energy in zip(time_list, energy_list):
+        net_time = max(loop_time - loops * empty_time, 0.0) / 1000
+        net_energy = max(energy - loops * empty_energy, 0.0)
+        energy_per_op.append(net_energy / loops)
+        ops_per_s.append(loops / net_time if net_time > 0 else None)
+        ops_per_j.append(loops / net_energy if net_energy > 0 else None)
+
+    return {
+        "loops": loops,
+        "empty_loop_time": empty_time,
+        "empty_loop_energy": empty_energy,
+        "energy_per_op": dispersion(energy_per_op),
+        "ops_per_s": dispersion(ops_per_s),
+        "ops_per_J": dispersion(ops_per_j),
+    }
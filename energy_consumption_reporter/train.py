@@ -0,0 +1,233 @@
+import argparse
+import io
+import json
+import logging
+import pickle
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+from sklearn.model_selection import GroupKFold
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import StandardScaler
+
+from energy_consumption_reporter.auto_detect import get_cpu_info
+from energy_consumption_reporter.cgroup import cpu_count
+from energy_consumption_reporter.model_data import data_path, feature_row, load_training_data, model_path
+from energy_consumption_reporter.piecewise_model import PiecewiseLinearModel
+
+logger = logging.getLogger(__name__)
+
+CANDIDATES = ["xgboost_hist", "xgboost_small",
+              "piecewise_linear", "linear", "ridge"]
+
+
+def make_candidate(name: str, n_jobs: int = 1):
+    """Returns an unfitted model for one of the CANDIDATES."""
+    if name == "xgboost_hist":
+        from xgboost import XGBRegressor
+        return XGBRegressor(n_jobs=n_jobs, tree_method="hist")
+    if name == "xgboost_small":
+        # fewer and shallower trees, trading accuracy for prediction latency
+        from xgboost import XGBRegressor
+        return XGBRegressor(n_jobs=n_jobs, tree_method="hist", n_estimators=30, max_depth=3)
+    if name == "piecewise_linear":
+        return PiecewiseLinearModel()
+    if name == "linear":
+        return LinearRegression()
+    if name == "ridge":
+        return make_pipeline(StandardScaler(), Ridge())
+    raise ValueError(f"Unknown candidate: {name}")
+
+
+def config_groups(X: pd.DataFrame) -> np.ndarray:
+    """Returns a group number per row, identifying its hardware configuration."""
+    configs = X.drop(columns=['utilization']).to_numpy(dtype=float)
+    return np.unique(configs, axis=0, return_inverse=True)[1].reshape(-1)
+
+
+def evaluate_candidate(name: str, values: np.ndarray, columns: list[str], power: np.ndarray, folds: int, n_jobs: int) -> dict[str, Any]:
+    """Cross-validates a candidate and fits it on all data.
+
+    The folds are grouped by hardware configuration, so the score reflects
+    how well the model predicts a machine that is not in the training data.
+    The data is passed as plain arrays and copied, since pandas objects
+    unpickled in a worker process are read-only and scikit-learn rejects them.
+    """
+    X = pd.DataFrame(np.array(values, dtype=float), columns=columns)
+    y = pd.Series(np.array(power, dtype=float))
+    groups = config_groups(X)
+    n_splits = min(folds, len(np.unique(groups)))
+    if n_splits < 2:
+        raise RuntimeError(
+            "The training data needs at least two hardware configurations for cross-validation")
+
+    y_true = []
+    y_pred = []
+    for train_index, test_index in GroupKFold(n_splits=n_splits).split(X, y, groups):
+        model = make_candidate(name, n_jobs)
+        model.fit(X.iloc[train_index], y.iloc[train_index])
+        y_true.append(y.iloc[test_index].to_numpy(dtype=float))
+        y_pred.append(np.asarray(model.predict(
+            X.iloc[test_index]), dtype=float))
+    y_true = np.concatenate(y_true)
+    y_pred = np.concatenate(y_pred)
+
+    model = make_candidate(name, n_jobs)
+    start = time.perf_counter()
+    model.fit(X, y)
+    fit_time = time.perf_counter() - start
+
+    return {
+        "name": name,
+        "folds": n_splits,
+        "mae": float(mean_absolute_error(y_true, y_pred)),
+        "rmse": float(np.sqrt(mean_squared_error(y_true, y_pred))),
+        "r2": float(r2_score(y_true, y_pred)),
+        "fit_time": fit_time,
+        "artifact": pickle.dumps(model),
+    }
+
+
+def median_time(func, repeat: int) -> float:
+    """Returns the median wall time of func in ms."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def measure_latency(artifact: bytes, Z: pd.DataFrame, repeat: int = 200, batch_size: int = 1000) -> dict[str, float]:
+    """Measures how fast a pickled model loads and predicts on the row of this machine.
+
+    The single-row latency is what the sampler pays for every sample, the
+    batched latency (per row) what predict_batch pays for a whole trace.
+    """
+    model = pickle.loads(artifact)
+    row = Z.copy()
+    batch = Z.loc[Z.index.repeat(batch_size)].reset_index(drop=True)
+    batch['utilization'] = np.linspace(0, 100, batch_size)
+    model.predict(row)
+
+    def predict_row():
+        row['utilization'] = 50.0
+        model.predict(row)
+
+    return {
+        "predict_latency": median_time(predict_row, repeat),
+        "batch_latency": median_time(lambda: model.predict(batch), max(repeat // 20, 3)) / batch_size,
+        "load_time": median_time(lambda: pickle.load(io.BytesIO(artifact)), max(repeat // 20, 3)),
+        "artifact_size": len(artifact),
+    }
+
+
+def train(candidates: Optional[list[str]] = None, path: str = data_path, folds: int = 5, processes: Optional[int] = None, max_latency: Optional[float] = None, export: bool = True) -> dict[str, Any]:
+    """Fits all candidates in parallel, reports their accuracy and latency and exports the best.
+
+    The latency is measured one candidate at a time after the training, so
+    it is not distorted by the other workers.
+
+    Keyword arguments:
+    candidates -- names of the models to compare (default: all CANDIDATES)
+    path -- training data in the format of the SPEC data
+    folds -- maximum amount of cross-validation folds
+    processes -- amount of candidates trained at the same time (default: all)
+    max_latency -- only select models with a single-row latency below this (ms)
+    export -- whether to write the selected model to the model cache
+    """
+    candidates = candidates or CANDIDATES
+    cpu_info = get_cpu_info(logger)
+    Z = feature_row(cpu_info)
+    X, y = load_training_data(Z.columns, cpu_info.chips, path)
+
+    processes = min(processes or len(candidates), len(candidates))
+    # the CPUs are split over the workers, so XGBoost does not oversubscribe them
+    n_jobs = max(int(cpu_count() // processes), 1)
+    logger.info('Training %d candidates with %d processes, %d threads each',
+                len(candidates), processes, n_jobs)
+
+    results = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        futures = {name: pool.submit(evaluate_candidate, name, X.to_numpy(dtype=float),
+                                       list(X.columns), y.to_numpy(dtype=float), folds, n_jobs)
+                   for name in candidates}
+        for name, future in futures.items():
+            try:
+                results.append(future.result())
+            except Exception as err:
+                logger.warning('Candidate %s failed: %s', name, err)
+                results.append({"name": name, "error": f"{type(err).__name__}: {err}"})
+
+    for result in results:
+        if "artifact" in result:
+            result.update(measure_latency(result["artifact"], Z))
+
+    eligible = [result for result in results if "artifact" in result and
+                (max_latency is None or result["predict_latency"] <= max_latency)]
+    selected = min(eligible, key=lambda result: result["mae"]) if eligible else None
+
+    if selected is None:
+        logger.warning('No candidate was selected')
+    elif export:
+        with open(model_path, "wb") as file:
+            file.write(selected["artifact"])
+        logger.info('Exported %s to %s', selected["name"], model_path)
+
+    return {
+        "data": path,
+        "rows": len(X),
+        "columns": list(X.columns),
+        "selected": selected["name"] if selected else None,
+        "exported": model_path if selected and export else None,
+        "candidates": [{key: value for key, value in result.items() if key != "artifact"}
+                       for result in results],
+    }
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog="ReporterTrain",
+        description="Trains and compares power models and exports the best one.",
+    )
+    parser.add_argument("-c", "--candidates", nargs="+", choices=CANDIDATES, default=None,
+                        help="models to compare (default: all)")
+    parser.add_argument("-d", "--data", default=data_path,
+                        help="training data (CSV)")
+    parser.add_argument("-f", "--folds", type=int, default=5,
+                        help="maximum amount of cross-validation folds")
+    parser.add_argument("-j", "--processes", type=int, default=None,
+                        help="amount of candidates trained at the same time")
+    parser.add_argument("--max-latency", type=float, default=None,
+                        help="only select models with a single-row prediction latency below this (ms)")
+    parser.add_argument("-o", "--output",
+                        help="file to write the report to (JSON)")
+    parser.add_argument("--no-export", action="store_true",
+                        help="do not write the selected model to the model cache")
+    return parser
+
+
+if __name__ == "__main__":
+    args = _parser().parse_args()
+    logging.basicConfig(level=logging.INFO)
+    report = train(args.candidates, args.data, args.folds,
+                   args.processes, args.max_latency, not args.no_export)
+
+    if args.output:
+        with open(args.output, 'w+') as file:
+            file.write(json.dumps(report, indent=4))
+
+    for result in report["candidates"]:
+        if "error" in result:
+            print(f"{result['name']:<18} {result['error']}")
+            continue
+        print(f"{result['name']:<18} MAE {result['mae']:>8.3f} W  RMSE {result['rmse']:>8.3f} W  "
+              f"R2 {result['r2']:>6.3f}  predict {result['predict_latency']:>7.3f} ms  "
+              f"batch {result['batch_latency'] * 1000:>7.3f} us/row  load {result['load_time']:>7.3f} ms"
+              f"{'  SELECTED' if result['name'] == report['selected'] else ''}")
@@ -0,0 +1,52 @@
+import pytest
+
+from energy_consumption_reporter.aggregator import Aggregator, LocalTransport, handle_message
+
+
+def record(seq, energy=(1.0, 2.0), run_id="run", cpu="CPU A", name="test_a"):
+    return {"run_id": run_id, "seq": seq, "model": "EnergyModel",
+            "hardware": {"CPU_name": cpu, "PC_name": "host"},
+            "case": {"name": name, "result": "pass", "energy": list(energy)}}
+
+
+def test_statistics_per_cpu_and_test():
+    aggregator = Aggregator()
+    assert aggregator.add([record(1), record(2, (3.0,)), record(1, run_id="other", cpu="CPU B")]) == (3, 0)
+
+    results = {row["cpu"]: row for row in aggregator.query(test="test_a")}
+    assert results["CPU A"]["cases"] == 2
+    assert results["CPU A"]["energy"]["n"] == 3
+    assert results["CPU A"]["energy"]["mean"] == pytest.approx(2.0)
+    assert results["CPU A"]["energy"]["std"] == pytest.approx(1.0)
+    assert results["CPU B"]["energy"]["max"] == 2.0
+
+
+def test_resent_records_are_counted_once():
+    transport = LocalTransport()
+    batch = {"type": "records", "records": [record(1), record(2)]}
+    assert transport.request(batch)["accepted"] == 2
+    reply = transport.request(batch)
+    assert (reply["accepted"], reply["duplicates"]) == (0, 2)
+    assert transport.aggregator.query()[0]["cases"] == 2
+
+
+@pytest.mark.parametrize("bad", [
+    1,
+    {**record(2), "seq": [2]},
+    {**record(2), "seq": True},
+    record(2, energy=(1.0, "abc")),
+    {**record(2), "case": {"name": "test_a", "power": 5}},
+])
+def test_invalid_batch_changes_nothing(bad):
+    aggregator = Aggregator()
+    reply = handle_message(aggregator, {"type": "records", "records": [record(1), bad]})
+    assert not reply["ok"]
+    assert aggregator.query() == []
+    assert aggregator.status()["runs"] == 0
+
+    # the valid records of the rejected batch are not treated as duplicates
+    assert aggregator.add([record(1), record(2)]) == (2, 0)
+
+
+def test_non_object_message_is_rejected():
+    assert not handle_message(Aggregator(), [1])["ok"]
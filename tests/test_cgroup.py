@@ -0,0 +1,111 @@
+import logging
+
+import pytest
+
+from energy_consumption_reporter.auto_detect import CPUInfo
+from energy_consumption_reporter.cgroup import Cgroup, apply_cgroup_limits, current_cgroup, list_cgroups
+
+
+def write(path, content):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content)
+
+
+@pytest.fixture
+def v2_root(tmp_path):
+    root = tmp_path / "cgroup"
+    write(root / "cgroup.controllers", "cpuset cpu memory")
+    write(root / "cpu.stat", "usage_usec 5000\nuser_usec 4000\n")
+    write(root / "app" / "cpu.stat", "usage_usec 1500\nuser_usec 1000\n")
+    write(root / "app" / "cpu.max", "150000 100000")
+    write(root / "app" / "cpuset.cpus.effective", "0-3,8,10-11")
+    write(root / "app" / "memory.max", str(2 * 1024 ** 3))
+    write(root / "other" / "cpu.max", "max 100000")
+    write(root / "other" / "memory.max", "max")
+    return root
+
+
+@pytest.fixture
+def v1_root(tmp_path):
+    root = tmp_path / "cgroup"
+    write(root / "cpuacct" / "app" / "cpuacct.usage", "1500000")
+    write(root / "cpu" / "app" / "cpu.cfs_quota_us", "50000")
+    write(root / "cpu" / "app" / "cpu.cfs_period_us", "100000")
+    write(root / "cpu" / "other" / "cpu.cfs_quota_us", "-1")
+    write(root / "cpu" / "other" / "cpu.cfs_period_us", "100000")
+    write(root / "cpuset" / "app" / "cpuset.cpus", "2,4-5")
+    write(root / "memory" / "app" / "memory.limit_in_bytes", str(512 * 1024 ** 2))
+    # v1 reports "unlimited" as a huge page-aligned number
+    write(root / "memory" / "other" / "memory.limit_in_bytes", "9223372036854771712")
+    return root
+
+
+def test_v2_usage_and_limits(v2_root):
+    cgroup = Cgroup("/app", str(v2_root))
+    assert cgroup.version == 2
+    assert cgroup.usage_ns() == 1_500_000
+    assert cgroup.cpu_quota() == 1.5
+    assert cgroup.cpuset_count() == 7
+    assert cgroup.effective_cpus() == 1.5
+    assert cgroup.memory_limit() == 2 * 1024 ** 3
+
+    unlimited = Cgroup("/other", str(v2_root))
+    assert unlimited.cpu_quota() is None
+    assert unlimited.memory_limit() is None
+    assert not unlimited.is_limited()
+
+
+def test_v1_usage_and_limits(v1_root):
+    cgroup = Cgroup("/app", str(v1_root))
+    assert cgroup.version == 1
+    assert cgroup.usage_ns() == 1_500_000
+    assert cgroup.cpu_quota() == 0.5
+    assert cgroup.cpuset_count() == 3
+    assert cgroup.memory_limit() == 512 * 1024 ** 2
+
+    unlimited = Cgroup("/other", str(v1_root))
+    assert unlimited.cpu_quota() is None
+    assert unlimited.memory_limit() is None
+
+
+def test_missing_cgroup(v2_root):
+    cgroup = Cgroup("/missing", str(v2_root))
+    assert not cgroup.exists()
+    assert cgroup.usage_ns() is None
+    with pytest.raises(FileNotFoundError):
+        list_cgroups("/missing", str(v2_root))
+
+
+def test_list_cgroups(v2_root):
+    assert [cgroup.path for cgroup in list_cgroups("/", str(v2_root))] == ["/", "/app"]
+
+
+def test_current_cgroup_v2(v2_root, tmp_path):
+    proc_path = tmp_path / "proc_cgroup"
+    write(proc_path, "0::/app\n")
+    assert current_cgroup(str(v2_root), str(proc_path)).path == "/app"
+
+    # without a cgroup namespace the host's path is not below the root
+    write(proc_path, "0::/system.slice/docker-1.scope\n")
+    assert current_cgroup(str(v2_root), str(proc_path)).path == "/"
+
+
+def test_current_cgroup_v1(v1_root, tmp_path):
+    proc_path = tmp_path / "proc_cgroup"
+    write(proc_path, "4:memory:/docker/1\n3:cpuset:/app\n2:cpu,cpuacct:/app\n1:name=systemd:/app\n")
+    cgroup = current_cgroup(str(v1_root), str(proc_path))
+    assert cgroup.path == "/app"
+    assert cgroup.controller_paths["memory"] == "/"
+    assert cgroup.usage_ns() == 1_500_000
+    assert cgroup.cpu_quota() == 0.5
+    assert cgroup.cpuset_count() == 3
+
+
+def test_apply_cgroup_limits(v2_root):
+    data = CPUInfo(chips=1, cores=8, threads=16, mem=64)
+    apply_cgroup_limits(data, Cgroup("/app", str(v2_root)), logging.getLogger(__name__))
+    assert (data.threads, data.cores, data.mem) == (2, 2, 2)
+
+    data = CPUInfo(chips=1, cores=8, threads=16, mem=64)
+    apply_cgroup_limits(data, Cgroup("/other", str(v2_root)), logging.getLogger(__name__))
+    assert (data.threads, data.cores, data.mem) == (16, 8, 64)
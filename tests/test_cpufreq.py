@@ -0,0 +1,40 @@
+import pytest
+
+from energy_consumption_reporter.cpufreq import CPUFreqReader, weighted_frequency
+
+
+def write_freq(root, cpu, khz):
+    path = root / f"cpu{cpu}" / "cpufreq" / "scaling_cur_freq"
+    path.parent.mkdir(parents=True)
+    path.write_text(f"{khz}\n")
+    return path
+
+
+def test_reader_orders_cpus_and_converts_to_mhz(tmp_path):
+    write_freq(tmp_path, 10, 3_000_000)
+    write_freq(tmp_path, 2, 2_400_000)
+    cpu0 = write_freq(tmp_path, 0, 800_000)
+    # cores without cpufreq and other entries are skipped
+    (tmp_path / "cpu1").mkdir()
+    (tmp_path / "cpufreq").mkdir()
+
+    with CPUFreqReader(str(tmp_path)) as reader:
+        assert reader.cpus == [0, 2, 10]
+        assert reader.read().tolist() == [800.0, 2400.0, 3000.0]
+
+        # the files are read again on every call
+        cpu0.write_text("1200000\n")
+        assert reader.read().tolist() == [1200.0, 2400.0, 3000.0]
+
+
+def test_reader_without_cpufreq(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        CPUFreqReader(str(tmp_path))
+
+
+def test_weighted_frequency():
+    assert weighted_frequency([1000.0, 3000.0], [0.0, 50.0]) == 3000.0
+    assert weighted_frequency([1000.0, 3000.0], [25.0, 75.0]) == 2500.0
+    # falls back to the mean when idle or when the lengths do not match
+    assert weighted_frequency([1000.0, 3000.0], [0.0, 0.0]) == 2000.0
+    assert weighted_frequency([1000.0, 3000.0], [50.0]) == 2000.0
@@ -0,0 +1,38 @@
+import threading
+import time
+
+from energy_consumption_reporter.middleware import EnergyAttributor
+
+
+class LinearModel:
+    def predict(self, utilization: float):
+        return 10.0 + 0.55 * utilization
+
+
+def test_every_request_is_counted_once():
+    attributor = EnergyAttributor(model=LinearModel(), interval=0.005)
+    attributor.start()
+
+    threads = 8
+    requests_per_thread = 500
+
+    def serve(route: str):
+        for _ in range(requests_per_thread):
+            request = attributor.begin(route)
+            sum(i * i for i in range(200))
+            attributor.end(request)
+
+    workers = [threading.Thread(target=serve, args=(f"GET /{i % 2}",))
+               for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    # let the sampler close the window of the last requests
+    time.sleep(0.05)
+    attributor.stop()
+
+    summary = attributor.summary()
+    assert sum(route["N"] for route in summary.values()) == threads * requests_per_thread
+    assert summary["GET /0"]["N"] == summary["GET /1"]["N"] == threads // 2 * requests_per_thread